@@ -4,12 +4,9 @@ from sqlalchemy import inspect
 from datetime import date
 from zoneinfo import ZoneInfo
 from markupsafe import Markup
+from functools import lru_cache
 import os
-import markdown as md
-from app.config import Config
-
-from dotenv import load_dotenv
-load_dotenv()
+from app.config import Config  # loads .env once
 
 # --- Locale / time ---
 REYKJAVIK = ZoneInfo("Atlantic/Reykjavik")
@@ -34,22 +31,34 @@ def utc_to_local_minutes(dt):
           .strftime("%Y-%m-%dT%H:%M")
     )
 
-def markdown_filter(text):
-    if not text:
-        return ""
-    html = md.markdown(
+@lru_cache(maxsize=512)
+def _render_markdown(text: str) -> str:
+    # imported lazily: markdown + extensions are a noticeable share of worker start-up
+    import markdown as md
+    return md.markdown(
         text,
         extensions=["extra", "tables", "fenced_code", "sane_lists", "nl2br", "smarty"],
     )
-    return Markup(html)
+
+def markdown_filter(text):
+    if not text:
+        return ""
+    return Markup(_render_markdown(text))
 
 db = SQLAlchemy()
 
 def ensure_schema():
-    # Create tables only if they don't exist (use 'elections' as sentinel)
+    # Create tables only if some don't exist (older DBs predate newer tables)
     insp = inspect(db.engine)
-    if not insp.has_table("elections"):
+    existing = set(insp.get_table_names())
+    if not set(db.metadata.tables) <= existing:
         db.create_all()
+    # create_all skips tables that exist, so add indexes introduced later
+    for name in existing & set(db.metadata.tables):
+        have = {ix["name"] for ix in insp.get_indexes(name)}
+        for ix in db.metadata.tables[name].indexes:
+            if ix.name not in have:
+                ix.create(db.engine)
 
 def create_app():
     app = Flask(
@@ -91,15 +100,11 @@ def create_app():
 
     app.jinja_env.globals["staticv"] = staticv
 
-    # Optionally load .env in dev
-    try:
-        from dotenv import load_dotenv
-        load_dotenv()
-    except Exception:
-        pass
-
     db.init_app(app)
 
+    from app.services import sessions
+    sessions.init_app(app)
+
     with app.app_context():
         from app import models  # ensure models are registered
         from app.controllers.main import main_bp
@@ -110,7 +115,12 @@ def create_app():
         app.register_blueprint(admin_bp, url_prefix="/admin")
         app.register_blueprint(voting_bp, url_prefix="/elections")
 
-        ensure_schema()
+        # Set SKIP_SCHEMA_CHECK=1 once the schema is in place to skip inspection on worker start
+        if not app.config.get("SKIP_SCHEMA_CHECK"):
+            ensure_schema()
+
+    from app.cli import register_cli
+    register_cli(app)
 
     @app.before_request
     def load_admin_flag():
@@ -120,6 +130,12 @@ def create_app():
         if kt:
             g.is_admin = db.session.query(AdminUser).filter_by(kennitala=kt).first() is not None
 
+    @app.before_request
+    def snapshot_finished_elections():
+        # Elections that ran past end_at have no close action; pick them up here
+        from app.services.snapshots import sweep_due
+        sweep_due()
+
     @app.context_processor
     def inject_flags():
         return {"is_admin": bool(getattr(g, "is_admin", False))}
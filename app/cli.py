@@ -0,0 +1,79 @@
+# app/cli.py
+# Flask CLI commands (run as `flask --app wsgi <command>`).
+import sys
+from datetime import timedelta
+
+import click
+
+from app import db
+
+def register_cli(app):
+    @app.cli.command("verify-receipts")
+    @click.argument("election_id", type=int)
+    @click.argument("receipts_file", type=click.File("r", encoding="utf-8"))
+    @click.option("--show-missing/--no-show-missing", default=True, help="List receipts not found in the registry.")
+    def verify_receipts_cmd(election_id, receipts_file, show_missing):
+        """Check a file of voter receipts (one per line) against ELECTION_ID's registry."""
+        from app.models import Election
+        from app.services.receipts import verify_receipts
+
+        election = db.session.get(Election, election_id)
+        if election is None:
+            raise click.ClickException(f"Election {election_id} not found")
+
+        report = verify_receipts(election, receipts_file)
+        click.echo(f"registry rows: {report['registry_rows']}")
+        click.echo(f"submitted:     {report['submitted']}")
+        click.echo(f"matched:       {report['matched']}")
+        click.echo(f"missing:       {len(report['missing'])}")
+        click.echo(f"duplicates:    {report['duplicates']}")
+        click.echo(f"malformed:     {len(report['malformed'])}")
+        if show_missing:
+            for r in report["missing"]:
+                click.echo(f"MISSING {r}")
+        if report["missing"] or report["malformed"]:
+            sys.exit(1)
+
+    @app.cli.command("archive-elections")
+    @click.argument("election_ids", type=int, nargs=-1)
+    @click.option("--older-than-days", type=int, default=30, show_default=True,
+                  help="Without ids: archive finished elections that ended at least this long ago.")
+    def archive_elections_cmd(election_ids, older_than_days):
+        """Move finished elections' ballots and registry into archive files."""
+        from app.models import Election, ElectionArchive, request_now
+        from app.services.archive import ArchiveError, archive_election
+
+        if not election_ids:
+            cutoff = request_now() - timedelta(days=older_than_days)
+            archived = {eid for (eid,) in db.session.query(ElectionArchive.election_id)}
+            election_ids = [eid for (eid,) in db.session.query(Election.id).filter(Election.end_at < cutoff)
+                            if eid not in archived]
+
+        failed = False
+        for eid in election_ids:
+            try:
+                path = archive_election(eid)
+                click.echo(f"archived {eid} -> {path}")
+            except ArchiveError as e:
+                failed = True
+                click.echo(f"skipped {eid}: {e}", err=True)
+        if failed:
+            sys.exit(1)
+
+    @app.cli.command("verify-archive")
+    @click.argument("target")
+    def verify_archive_cmd(target):
+        """Verify an archive: pass a file path (offline check) or an election id (also checks the DB summary)."""
+        from app.services.archive import ArchiveError, verify_archive_file, verify_archived_election
+
+        try:
+            report = verify_archived_election(int(target)) if target.isdigit() else verify_archive_file(target)
+        except ArchiveError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"election:      {report['election_id']}")
+        click.echo(f"chain head:    {report['chain_head']}")
+        click.echo(f"chain length:  {report['chain_length']}")
+        click.echo(f"receipts:      {report['receipt_count']}")
+        click.echo("OK" if report["ok"] else "FAILED: " + "; ".join(report["problems"]))
+        if not report["ok"]:
+            sys.exit(1)
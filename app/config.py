@@ -13,8 +13,30 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-change-me")
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///elections.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Skip the create-missing-tables inspection in create_app (schema already migrated)
+    SKIP_SCHEMA_CHECK = _env_bool("SKIP_SCHEMA_CHECK", False)
     DEFAULT_IMAGE = os.environ.get("DEFAULT_IMAGE", "img/default_election_clean_dark.svg")
     ICEPIRATE_BASE = os.getenv("ICEPIRATE_BASE", "https://member.piratar.is")
     ICEPIRATE_API_KEY = os.getenv("ICEPIRATE_API_KEY", "")
     ICEPIRATE_FIELD = os.getenv("ICEPIRATE_FIELD", "ssn")
     USE_ICEPIRATE = _env_bool("USE_ICEPIRATE", False)
+    # How often (seconds, per worker) to look for finished elections lacking a result snapshot
+    SNAPSHOT_SWEEP_SECONDS = int(os.getenv("SNAPSHOT_SWEEP_SECONDS", "60"))
+    # Export requests wait this long for the worker's snapshot build before answering 503 + Retry-After
+    SNAPSHOT_WAIT_SECONDS = float(os.getenv("SNAPSHOT_WAIT_SECONDS", "10"))
+    # Auðkenni login runs in a per-worker pool: max concurrent checks, breaker after N straight failures
+    LOGIN_MAX_CONCURRENT = int(os.getenv("LOGIN_MAX_CONCURRENT", "50"))
+    LOGIN_BREAKER_THRESHOLD = int(os.getenv("LOGIN_BREAKER_THRESHOLD", "5"))
+    LOGIN_BREAKER_COOLDOWN = float(os.getenv("LOGIN_BREAKER_COOLDOWN", "30"))
+    LOGIN_ATTEMPT_TTL = int(os.getenv("LOGIN_ATTEMPT_TTL", "600"))
+    # "cookie" (signed client-side, default) or "db" (opaque id cookie, data in server_sessions)
+    SESSION_BACKEND = os.getenv("SESSION_BACKEND", "cookie").strip().lower()
+    SESSION_SWEEP_SECONDS = int(os.getenv("SESSION_SWEEP_SECONDS", "300"))
+    # Votes per published chain checkpoint (fixed per election when it is created)
+    CHAIN_CHECKPOINT_EVERY = int(os.getenv("CHAIN_CHECKPOINT_EVERY", "100"))
+    # How often each worker checks chain_summaries for votes cast in other workers (live turnout)
+    TURNOUT_POLL_SECONDS = float(os.getenv("TURNOUT_POLL_SECONDS", "1.0"))
+    # Live turnout streams are closed after this many seconds; the browser reconnects on its own
+    TURNOUT_STREAM_SECONDS = float(os.getenv("TURNOUT_STREAM_SECONDS", "300"))
+    # On workers without threads the stream sends one update and closes; the browser re-polls this often
+    TURNOUT_SYNC_POLL_SECONDS = float(os.getenv("TURNOUT_SYNC_POLL_SECONDS", "30"))
@@ -1,10 +1,16 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import (
+    Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, Response
+)
 from datetime import datetime, UTC
 from zoneinfo import ZoneInfo
 import json, secrets
 
-from app.models import AdminUser, Election, VotingRegistry, Vote
+from app.models import AdminUser, ArchivedReceipt, Election, ElectionArchive, VotingRegistry, Vote
 from app.services.auth import admin_required
+from app.services import archive, chain, snapshots
+from app.services.receipts import verify_receipts
+from app.services import election_import
+from app.services.turnout import hub
 from app import db
 
 admin_bp = Blueprint("admin", __name__)
@@ -32,6 +38,31 @@ def home():
         elections=elections, 
         default_image=current_app.config["DEFAULT_IMAGE"],)
 
+@admin_bp.route("/turnout/stream")
+@admin_required
+def turnout_stream():
+    """
+    Server-sent events with live turnout for ?e=<id>&e=<id>... (default: all
+    open elections). One stream per viewer replaces page reloads; it ends
+    after TURNOUT_STREAM_SECONDS and the browser reconnects.
+    """
+    ids = request.args.getlist("e", type=int)
+    if not ids:
+        ids = [e.id for e in Election.open_elections()]
+    if request.environ.get("wsgi.multithread"):
+        hub.start(current_app._get_current_object())
+        stream_opts = dict(max_age=current_app.config.get("TURNOUT_STREAM_SECONDS", 300))
+    else:
+        # A sync worker serves one request at a time: send the counts and close,
+        # so an admin tab polls every TURNOUT_SYNC_POLL_SECONDS instead of pinning it
+        stream_opts = dict(max_age=0, retry=current_app.config.get("TURNOUT_SYNC_POLL_SECONDS", 30))
+    initial = hub.snapshot(ids)
+    return Response(
+        hub.stream(ids, initial, **stream_opts),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @admin_bp.route("/admins", methods=["POST"])
 @admin_required
 def admins_mod():
@@ -102,19 +133,58 @@ def create_election():
             salt=secrets.token_hex(16),
         )
         db.session.add(election)
+        db.session.flush()
+        chain.init_summary(election.id)
         db.session.commit()
         flash("Election created", "success")
         return redirect(url_for("admin.home"))
 
     return render_template("admin/create_election.html")
 
+@admin_bp.route("/elections/import", methods=["POST"])
+@admin_required
+def import_elections():
+    """
+    Create many elections at once from a JSON body or an uploaded CSV file
+    (field `file`). All records are validated first; any error rejects the batch.
+    """
+    try:
+        if request.is_json:
+            records = election_import.records_from_json(request.get_json())
+        elif "file" in request.files:
+            text = request.files["file"].read().decode("utf-8-sig")
+            records = election_import.records_from_csv(text)
+        else:
+            return jsonify({"errors": [{"index": None, "error": "Send JSON or a CSV file"}]}), 400
+    except ValueError as e:
+        return jsonify({"errors": [{"index": None, "error": str(e)}]}), 400
+
+    elections, errors = election_import.build_elections(records)
+    if errors:
+        return jsonify({"created": [], "errors": errors}), 400
+
+    db.session.add_all(elections)
+    db.session.flush()
+    for e in elections:
+        chain.init_summary(e.id)
+    db.session.commit()
+    return jsonify({"created": [e.id for e in elections], "errors": []}), 201
+
 @admin_bp.route("/elections/<int:election_id>/delete", methods=["POST"])
 @admin_required
 def delete_election(election_id: int):
+    arch = db.session.get(ElectionArchive, election_id)
+    archive_path = arch.path if arch is not None else None
     VotingRegistry.query.filter_by(election_id=election_id).delete()
     Vote.query.filter_by(election_id=election_id).delete()
+    ElectionArchive.query.filter_by(election_id=election_id).delete()
+    ArchivedReceipt.query.filter_by(election_id=election_id).delete()
+    chain.delete_chain(election_id)
     Election.query.filter_by(id=election_id).delete()
     db.session.commit()
+    snapshots.retire_snapshot(election_id)
+    if archive_path:
+        archive.retire_archive_file(archive_path)
     flash("Election deleted", "success")
     return redirect(url_for("admin.home"))
 
@@ -125,6 +195,8 @@ def close_election(election_id: int):
     if e.closed_at is None:
         e.closed_at = datetime.now(UTC).replace(second=0, microsecond=0)
         db.session.commit()
+        if e.state() == "closed":  # closing an upcoming election leaves nothing to snapshot
+            snapshots.schedule_snapshot(e.id)
         flash("Election closed now.", "success")
     else:
         flash("Election is already closed.", "error")
@@ -134,10 +206,31 @@ def close_election(election_id: int):
 @admin_required
 def reopen_election(election_id: int):
     e = Election.query.get_or_404(election_id)
-    if e.closed_at is not None:
+    if db.session.get(ElectionArchive, e.id) is not None:
+        flash("Archived elections cannot be reopened.", "error")
+    elif e.closed_at is not None:
         e.closed_at = None
         db.session.commit()
+        # results will change; keep the old snapshot on disk but stop serving it
+        snapshots.retire_snapshot(e.id)
         flash("Election reopened.", "success")
     else:
         flash("Election is not closed.", "error")
     return redirect(url_for("admin.home"))
+
+@admin_bp.route("/elections/<int:election_id>/receipts/verify", methods=["GET", "POST"])
+@admin_required
+def verify_election_receipts(election_id: int):
+    """Check an uploaded file of voter receipts against the registry in one pass."""
+    e = Election.query.get_or_404(election_id)
+    report = None
+    if request.method == "POST":
+        upload = request.files.get("receipts")
+        if not upload:
+            flash("Receipt file required", "error")
+            return redirect(url_for("admin.verify_election_receipts", election_id=e.id))
+        lines = (raw.decode("utf-8", errors="replace") for raw in upload.stream)
+        report = verify_receipts(e, lines)
+        if request.args.get("format") == "json":
+            return jsonify(report)
+    return render_template("admin/verify_receipts.html", election=e, report=report)
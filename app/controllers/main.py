@@ -1,23 +1,22 @@
-from datetime import datetime, UTC, timedelta
-from flask import Blueprint, render_template, current_app, redirect, url_for, request, flash
-from app.models import Election, AdminUser
-from app.services import auth
+from flask import Blueprint, render_template, current_app, redirect, url_for, request, flash, session, jsonify
+from app.models import Election, AdminUser, request_now
+from app.services import auth, login_flow
 from app import db
-from audkenni import see_some_id
 
 main_bp = Blueprint("main", __name__)
 
 @main_bp.route("/")
 def index():
-    now = datetime.now(UTC).replace(second=0, microsecond=0)
-    grace = timedelta(days=14)
+    now = request_now()
 
     # Show: all open or upcoming elections, plus those that ended within last 14 days
-    elections = (Election.query
-        .filter(Election.end_at >= (now - grace))
-        .order_by(Election.start_at.desc(), Election.id.desc())
-        .all()
+    # (three indexed range queries; finished history never gets loaded)
+    elections = (
+        Election.open_elections(now)
+        + Election.upcoming_elections(now)
+        + Election.recently_finished_elections(days=14, now=now)
     )
+    elections.sort(key=lambda e: (e._aware(e.start_at), e.id), reverse=True)
     return render_template(
         "index.html",
         elections=elections,
@@ -34,25 +33,54 @@ def login():
             flash("Sláðu inn símanúmer", "error")
             return redirect(url_for("main.login"))
 
+        # Identity confirmation happens on the phone; don't hold this worker while it does
         try:
-            person = see_some_id(phone, PURPOSE)
-        except Exception as e:
-            flash("Innskráning tókst ekki"+str(e), "error")
-            # (Optionally show a more specific message in logs only)
+            attempt_id = login_flow.start(phone, PURPOSE)
+        except login_flow.LoginUnavailable:
+            flash("Innskráning er ekki tiltæk í augnablikinu, reyndu aftur eftir smástund.", "error")
             return render_template("login.html", form={"phone": phone})
 
-        ssn = person["nationalRegisterId"]
-        name = person["name"]
-        signature = person["signature"]
-
-        is_admin = bool(AdminUser.query.filter_by(kennitala=ssn).first())
-        auth.set_authenticated(person, is_admin)
-        flash("Innskráning tókst", "success")
-        next_url = request.args.get("next") or url_for("main.index")
-        return redirect(next_url)
+        session["login_attempt"] = attempt_id
+        session["login_next"] = request.args.get("next") or url_for("main.index")
+        return redirect(url_for("main.login_pending"))
 
     return render_template("login.html")
 
+@main_bp.route("/login/pending")
+def login_pending():
+    if not session.get("login_attempt"):
+        return redirect(url_for("main.login"))
+    return render_template("login_pending.html")
+
+@main_bp.route("/login/status")
+def login_status():
+    attempt = login_flow.status(session.get("login_attempt"))
+    return jsonify({"status": attempt.status if attempt else login_flow.FAILED})
+
+@main_bp.route("/login/finish")
+def login_finish():
+    attempt_id = session.get("login_attempt")
+    attempt = login_flow.status(attempt_id)
+    if attempt is not None and attempt.status == login_flow.PENDING:
+        return redirect(url_for("main.login_pending"))
+
+    next_url = session.pop("login_next", None) or url_for("main.index")
+    session.pop("login_attempt", None)
+    if attempt is None or attempt.status != login_flow.OK:
+        error = attempt.error if attempt is not None else ""
+        if attempt is not None:
+            login_flow.discard(attempt_id)
+        flash("Innskráning tókst ekki" + (f": {error}" if error else ""), "error")
+        return redirect(url_for("main.login"))
+
+    person = {"nationalRegisterId": attempt.national_register_id, "name": attempt.name}
+    login_flow.discard(attempt_id)
+
+    is_admin = bool(AdminUser.query.filter_by(kennitala=person["nationalRegisterId"]).first())
+    auth.set_authenticated(person, is_admin)
+    flash("Innskráning tókst", "success")
+    return redirect(next_url)
+
 #
 #@main_bp.route("/login", methods=["GET", "POST"])
 #def login():
@@ -1,55 +1,37 @@
 # app/controllers/voting.py
-from datetime import datetime, date, UTC
-import json, csv, random, os, re
+from datetime import datetime, UTC
 from pathlib import Path
-from sqlalchemy.engine import make_url
 from sqlalchemy import func
 from flask import (
     Blueprint, render_template, redirect, url_for, request,
-    flash, abort, send_file, current_app, session
+    flash, abort, send_file, current_app, session, jsonify
 )
 from app.models import Election, Vote, VotingRegistry
 from app.services.auth import current_kennitala
-from app.services.hashing import canonicalize_vote, compute_vote_hash
+from app.services.hashing import canonicalize_vote, voter_option_order
 from app.services.eligibility import user_is_eligible
+from app.services import archive, ballots, chain, snapshots
+from app.services.turnout import hub
 from app import db
 
 voting_bp = Blueprint("voting", __name__)
 
-def _export_dir() -> Path:
-    """Return <directory containing the DB>/election_exports (create if missing)."""
-    uri = current_app.config["SQLALCHEMY_DATABASE_URI"]
-    url = make_url(uri)
-
-    # Default base: instance path (works for non-SQLite or unknowns)
-    base_dir = Path(current_app.instance_path)
-
-    # If SQLite file, use its actual on-disk directory
-    if url.drivername.startswith("sqlite") and url.database:
-        db_path = Path(url.database)
-        if not db_path.is_absolute():
-            # Try resolving relative to instance_path first; fallback to CWD
-            candidate = (Path(current_app.instance_path) / db_path)
-            db_path = candidate.resolve() if candidate.parent.exists() else db_path.resolve()
-        base_dir = db_path.parent
-
-    out = base_dir / "election_exports"
-    out.mkdir(parents=True, exist_ok=True)
-    return out
-
 @voting_bp.route("/<int:election_id>")
 def election_detail(election_id: int):
     election = Election.query.get_or_404(election_id)
     if not current_kennitala():
         return redirect(url_for("main.login", next=url_for("voting.election_detail", election_id=election.id)))
 
-    # shuffle options per user (unchanged) ...
-    key = f"shuffled_options_e{election.id}"
-    if key not in session:
-        opts = election.options()[:]
-        random.shuffle(opts)
-        session[key] = opts
-    shuffled = session[key]
+    # shuffle options per user; derived from a keyed hash, not kept in the session
+    shuffled = voter_option_order(
+        election.options(),
+        election.id,
+        current_kennitala(),
+        salt=election.salt,
+        secret=current_app.config.get("SECRET_KEY"),
+    )
+    # drop the copy older versions kept in the cookie
+    session.pop(f"shuffled_options_e{election.id}", None)
 
     # Fetch the registry row (not just a bool)
     reg = VotingRegistry.query.filter_by(
@@ -83,6 +65,7 @@ def election_detail(election_id: int):
 
     # Compute receipt if user has voted
     receipt_hash = None
+    arch = archive.get_archive(election.id)
     if reg:
         from app.services.hashing import compute_registry_receipt
         receipt_hash = compute_registry_receipt(
@@ -92,17 +75,24 @@ def election_detail(election_id: int):
             salt=election.salt,
             secret=current_app.config.get("SECRET_KEY"),
         )
-
-    # Totals for finished elections (cheap even if we compute always)
-    registry_count = db.session.query(func.count(VotingRegistry.id))\
-                               .filter_by(election_id=election.id).scalar()
-    votes_count    = db.session.query(func.count(Vote.id))\
-                               .filter_by(election_id=election.id).scalar()
+    elif arch is not None:
+        # registry rows are gone once archived; the receipt was kept under a lookup key
+        receipt_hash = archive.receipt_for_voter(election, current_kennitala())
+
+    # Totals are only shown for finished elections; live turnout is on the admin stream
+    registry_count = votes_count = None
+    if arch is not None:
+        registry_count, votes_count = arch.receipt_count, arch.vote_count
+    elif not election.is_open() and not election.is_upcoming():
+        registry_count = db.session.query(func.count(VotingRegistry.id))\
+                                   .filter_by(election_id=election.id).scalar()
+        votes_count    = db.session.query(func.count(Vote.id))\
+                                   .filter_by(election_id=election.id).scalar()
 
     return render_template(
         "election_detail.html",
         election=election,
-        already=bool(reg),
+        already=bool(reg or receipt_hash),
         eligible_flag=eligible_flag,
         receipt_hash=receipt_hash,           
         default_image=current_app.config["DEFAULT_IMAGE"],
@@ -112,17 +102,13 @@ def election_detail(election_id: int):
         eligibility_debug=eligibility_debug
     )
 
-@voting_bp.route("/<int:election_id>/vote", methods=["POST"])
-def cast_vote(election_id: int):
-    election = Election.query.get_or_404(election_id)
-    kt = current_kennitala()
-    if not kt:
-        return redirect(url_for("main.login", next=url_for("voting.election_detail", election_id=election.id)))
+CLOSED_REFUSAL = ("This election is not accepting votes at this time.", 403)
 
+def _vote_refusal(election, kt):
+    """(message, http status) if `kt` may not vote in `election` right now, else None."""
     # NEW: only allow voting while the election is open
     if not election.is_open():
-        flash("This election is not accepting votes at this time.", "error")
-        return redirect(url_for("voting.election_detail", election_id=election.id))
+        return CLOSED_REFUSAL
 
     # NEW: eligibility check
     use_ice = current_app.config.get("USE_ICEPIRATE", False)
@@ -136,150 +122,167 @@ def cast_vote(election_id: int):
             field=current_app.config.get("ICEPIRATE_FIELD", "ssn"),
         )
         if not ok:
-            flash("Þú ert ekki gjaldgeng/ur í þessari kosningu (skráning nýrri en skilyrði leyfir).", "error")
-            return redirect(url_for("voting.election_detail", election_id=election.id))
-
+            return "Þú ert ekki gjaldgeng/ur í þessari kosningu (skráning nýrri en skilyrði leyfir).", 403
 
     existing = VotingRegistry.query.filter_by(election_id=election.id, kennitala=kt).first()
     if existing:
-        flash("You have already voted in this election.", "error")
-        return redirect(url_for("voting.election_detail", election_id=election.id))
+        return "You have already voted in this election.", 409
+    return None
+
+def _record_vote(election, kt, vote_payload) -> int | None:
+    """
+    Store the ballot and registry row; returns the new chain length, None if
+    it kept conflicting. Raises chain.ElectionClosed if the election closed
+    since _vote_refusal checked (nothing is stored).
+    """
+    canonical = canonicalize_vote(vote_payload)
 
-    options = election.options()
-    if len(options) == 1:
-        choice = request.form.get("yesno")
-        if choice not in ("YES", "NO"):
-            flash("Invalid yes/no vote.", "error")
-            return redirect(url_for("voting.election_detail", election_id=election.id))
-        vote_payload = {"type": "yesno", "vote": choice, "option": options[0]}
+    # Extend the chain from the cached head; retry if a concurrent vote got there first
+    for _ in range(5):
+        try:
+            turnout = chain.append_vote(election, canonical)
+            db.session.add(VotingRegistry(
+                election_id=election.id,
+                kennitala=kt,
+                timestamp=datetime.now(UTC),
+            ))
+            db.session.commit()
+            break
+        except chain.ChainConflict:
+            db.session.rollback()
+        except chain.ElectionClosed:
+            db.session.rollback()
+            raise
     else:
-        # Enforce: non-empty vote, no duplicates, no gaps (contiguous from rank 1)
-        seen = set()
-        ranking = []
-
-        first = request.form.get("rank_1")
-        if not first or first not in options:
-            flash("Rank 1 must be selected.", "error")
-            return redirect(url_for("voting.election_detail", election_id=election.id))
-
-        encountered_blank = False
-        for i in range(1, len(options) + 1):
-            val = request.form.get(f"rank_{i}")
-            if not val:
-                encountered_blank = True
-                continue
-            if encountered_blank:
-                flash("No gaps allowed: fill earlier ranks before later ones.", "error")
-                return redirect(url_for("voting.election_detail", election_id=election.id))
-            if val not in options or val in seen:
-                flash("Invalid or duplicate ranking.", "error")
-                return redirect(url_for("voting.election_detail", election_id=election.id))
-            seen.add(val)
-            ranking.append(val)
-
-        vote_payload = {"type": "ranked", "ranking": ranking, "options": options}
+        return None
+    hub.bump(election.id, turnout)
+    return turnout
 
-    canonical = canonicalize_vote(vote_payload)
-    prev = db.session.query(Vote.vote_hash).filter_by(election_id=election.id).order_by(Vote.id.desc()).limit(1).scalar()
-    vote_hash = compute_vote_hash(election.salt, canonical, prev)
-
-    # Keep vote_date as a date (legacy), but timestamps should be aware UTC
-    v = Vote(
-        election_id=election.id,
-        vote_json=canonical,
-        vote_date=date.today(),
-        prev_hash=prev,
-        vote_hash=vote_hash,
-    )
-    db.session.add(v)
+@voting_bp.route("/<int:election_id>/vote", methods=["POST"])
+def cast_vote(election_id: int):
+    election = Election.query.get_or_404(election_id)
+    kt = current_kennitala()
+    if not kt:
+        return redirect(url_for("main.login", next=url_for("voting.election_detail", election_id=election.id)))
 
-    reg = VotingRegistry(
-        election_id=election.id,
-        kennitala=kt,
-        timestamp=datetime.now(UTC),
-    )
-    db.session.add(reg)
+    refusal = _vote_refusal(election, kt)
+    if refusal:
+        flash(refusal[0], "error")
+        return redirect(url_for("voting.election_detail", election_id=election.id))
+
+    # Enforce: non-empty vote, no duplicates, no gaps (contiguous from rank 1)
+    try:
+        vote_payload = ballots.validator_for(election).payload_from_form(request.form)
+    except ballots.BallotError as e:
+        flash(str(e), "error")
+        return redirect(url_for("voting.election_detail", election_id=election.id))
+
+    try:
+        recorded = _record_vote(election, kt, vote_payload)
+    except chain.ElectionClosed:
+        flash(CLOSED_REFUSAL[0], "error")
+        return redirect(url_for("voting.election_detail", election_id=election.id))
+    if recorded is None:
+        flash("Could not record your vote, please try again.", "error")
+        return redirect(url_for("voting.election_detail", election_id=election.id))
 
-    db.session.commit()
     flash("Vote submitted. Thank you!", "success")
     return redirect(url_for("voting.election_detail", election_id=election.id))
 
+@voting_bp.route("/<int:election_id>/ballot", methods=["POST"])
+def cast_vote_json(election_id: int):
+    """
+    JSON ballot API (same session and rules as cast_vote):
+    {"vote": "YES"|"NO"} for yes/no, {"ranking": ["...", ...]} for ranked.
+    """
+    election = Election.query.get_or_404(election_id)
+    kt = current_kennitala()
+    if not kt:
+        return jsonify({"error": "Not authenticated."}), 401
+
+    refusal = _vote_refusal(election, kt)
+    if refusal:
+        return jsonify({"error": refusal[0]}), refusal[1]
+
+    try:
+        vote_payload = ballots.validator_for(election).payload_from_json(request.get_json(silent=True))
+    except ballots.BallotError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        recorded = _record_vote(election, kt, vote_payload)
+    except chain.ElectionClosed:
+        return jsonify({"error": CLOSED_REFUSAL[0]}), CLOSED_REFUSAL[1]
+    if recorded is None:
+        return jsonify({"error": "Could not record your vote, please try again."}), 503
+    return jsonify({"ok": True}), 201
+
 @voting_bp.route("/<int:election_id>/export")
 def export_votes(election_id: int):
     election = Election.query.get_or_404(election_id)
 
-    # Block export while election is open
-    if election.is_open():
+    # Block export until the election has finished (open or not yet started)
+    if election.state() != "closed":
         abort(403, description="Election not finished yet.")
 
-    votes = Vote.query.filter_by(election_id=election.id).order_by(Vote.id.asc()).all()
-    options = election.options()
-
-    # --- sanitize helper: remove any line breaks / weird separators and trim ---
-    _WS_BREAKS = re.compile(r"[\r\n\u2028\u2029]+")  # CR, LF, Unicode LS/PS
-
-    def safe_cell(val):
-        if val is None:
-            return ""
-        if isinstance(val, str):
-            # 1) remove any linebreak characters completely (replace with space)
-            s = _WS_BREAKS.sub(" ", val)
-            # 2) collapse remaining whitespace runs, trim
-            s = re.sub(r"\s+", " ", s).strip()
-            # 3) optional: strip straight quotes to avoid Excel weirdness when not quoting
-            s = s.replace('"', "").replace("'", "")
-            return s
-        return val
-
-    export_dir: Path = _export_dir()
-    tmp_path: Path = export_dir / f"election_{election.id}_votes.csv"
-
-    # No BOM, no forced quoting, LF line endings
-    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(
-            f,
-            lineterminator="\n",
-            quoting=csv.QUOTE_MINIMAL,   # no quotes unless a comma sneaks in
-            escapechar="\\",
-            doublequote=False,
-        )
-
-        if len(options) == 1:
-            writer.writerow(["election_id", "vote_date", "type", "question", "vote", "prev_hash", "vote_hash"])
-            for v in votes:
-                p = json.loads(v.vote_json)
-                writer.writerow([
-                    election.id,
-                    v.vote_date.isoformat(),
-                    safe_cell(p.get("type")),
-                    safe_cell(p.get("option", "")),
-                    safe_cell(p.get("vote", "")),
-                    safe_cell(v.prev_hash or ""),
-                    safe_cell(v.vote_hash),
-                ])
-        else:
-            header = ["election_id", "vote_date", "type"] \
-                     + [f"rank_{i+1}" for i in range(len(options))] \
-                     + ["prev_hash", "vote_hash"]
-            writer.writerow(header)
-
-            for v in votes:
-                p = json.loads(v.vote_json)
-                ranking = [safe_cell(x) for x in p.get("ranking", [])]
-                # pad to fixed width (no quotes on blanks)
-                ranking += [""] * (len(options) - len(ranking))
-                writer.writerow([
-                    election.id,
-                    v.vote_date.isoformat(),
-                    safe_cell(p.get("type")),
-                    *ranking,
-                    safe_cell(v.prev_hash or ""),
-                    safe_cell(v.vote_hash),
-                ])
+    # Served from the close-time snapshot; if the background job has not
+    # finished yet, wait for it (one build per worker) rather than build here
+    snap_dir = _snapshot_or_none(election)
+    if snap_dir is None:
+        return _results_not_ready()
 
     return send_file(
-        str(tmp_path),
+        str(snap_dir / snapshots.csv_name(election.id)),
         as_attachment=True,
-        download_name=f"election_{election.id}_votes.csv",
+        download_name=snapshots.csv_name(election.id),
         mimetype="text/csv; charset=utf-8"
-    )
\ No newline at end of file
+    )
+
+@voting_bp.route("/<int:election_id>/export/<any('tally.json', 'manifest.json'):name>")
+def export_snapshot_file(election_id: int, name: str):
+    """Tally and manifest (file hashes + chain head) from the close-time snapshot."""
+    election = Election.query.get_or_404(election_id)
+    if election.state() != "closed":
+        abort(403, description="Election not finished yet.")
+
+    snap_dir = _snapshot_or_none(election)
+    if snap_dir is None:
+        return _results_not_ready()
+    return send_file(str(snap_dir / name), mimetype="application/json")
+
+def _snapshot_or_none(election) -> Path | None:
+    return snapshots.wait_for_snapshot(
+        election.id, current_app.config.get("SNAPSHOT_WAIT_SECONDS", 10.0)
+    )
+
+def _results_not_ready():
+    retry = current_app.config.get("SNAPSHOT_WAIT_SECONDS", 10.0)
+    return (jsonify({"error": "Results are being prepared, try again shortly."}), 503,
+            {"Retry-After": str(max(1, int(retry)))})
+
+@voting_bp.route("/<int:election_id>/chain")
+def chain_feed(election_id: int):
+    """
+    Public chain-head feed: current head/length plus checkpoints after `since`.
+    Served from the cached summary; polling with If-None-Match is a 304.
+    """
+    Election.query.get_or_404(election_id)
+    since = request.args.get("since", 0, type=int)
+
+    head, length, every, _ = chain.summary(election_id)
+    etag = f"{length}-{since}"
+    if request.if_none_match.contains(etag):
+        return "", 304
+
+    resp = jsonify({
+        "election_id": election_id,
+        "head": head,
+        "length": length,
+        "checkpoint_every": every,
+        "latest_checkpoint": length // every,
+        "checkpoints": chain.checkpoints_since(election_id, since),
+    })
+    resp.set_etag(etag)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = 5
+    return resp
@@ -1,6 +1,9 @@
 
 from datetime import datetime, UTC, timedelta
 import json
+from functools import lru_cache
+from flask import g, has_request_context
+from sqlalchemy import or_
 from app import db
 
 def _to_aware_utc(dt):
@@ -9,6 +12,23 @@ def _to_aware_utc(dt):
     # If SQLite returned naive, assume it's UTC
     return dt.replace(tzinfo=UTC) if dt.tzinfo is None else dt.astimezone(UTC)
 
+def request_now():
+    """
+    Minute-precision UTC "now", computed once per request so every election
+    on a page is judged against the same instant.
+    """
+    if not has_request_context():
+        return datetime.now(UTC).replace(second=0, microsecond=0)
+    if "now" not in g:
+        g.now = datetime.now(UTC).replace(second=0, microsecond=0)
+    return g.now
+
+
+# options_json never changes after creation; parse each distinct value once per worker
+@lru_cache(maxsize=1024)
+def _parse_options(options_json: str) -> tuple[str, ...]:
+    return tuple(json.loads(options_json))
+
 
 class AdminUser(db.Model):
     __tablename__ = 'admin_users'
@@ -33,34 +53,75 @@ class Election(db.Model):
     # NEW: date-only cutoff (YYYY-MM-DD)
     eligibility_cutoff = db.Column(db.Date, nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_elections_end_at', 'end_at'),
+        db.Index('ix_elections_start_at', 'start_at'),
+    )
+
     # convenience
     def eligibility_required(self) -> bool:
         return self.eligibility_cutoff is not None
 
-    def options(self):
-        return json.loads(self.options_json)
+    def options(self) -> list[str]:
+        return list(_parse_options(self.options_json))
 
     def _aware(self, dt):
         if dt is None: return None
         return dt.replace(tzinfo=UTC) if dt.tzinfo is None else dt.astimezone(UTC)
 
-    def is_open(self) -> bool:
-        now = datetime.now(UTC).replace(second=0, microsecond=0)
+    def state(self, now=None) -> str:
+        """'upcoming', 'open' or 'closed'; cached per instance for a given `now`."""
+        now = now or request_now()
+        cached = self.__dict__.get("_state_cache")
+        if cached and cached[0] == now and cached[1] == self.closed_at:
+            return cached[2]
         start = self._aware(self.start_at)
         end   = self._aware(self.end_at)
-        closed = self._aware(self.closed_at) if self.closed_at else None
-        return (closed is None) and (start <= now <= end)
+        if start > now:
+            state = "upcoming"
+        elif self.closed_at is None and now <= end:
+            state = "open"
+        else:
+            state = "closed"
+        self.__dict__["_state_cache"] = (now, self.closed_at, state)
+        return state
 
-    def is_upcoming(self) -> bool:
-        now = datetime.now(UTC).replace(second=0, microsecond=0)
-        start = self._aware(self.start_at)
-        return start > now
+    def is_open(self, now=None) -> bool:
+        return self.state(now) == "open"
 
-    def is_recently_finished(self, days: int = 7) -> bool:
-        now = datetime.now(UTC).replace(second=0, microsecond=0)
+    def is_upcoming(self, now=None) -> bool:
+        return self.state(now) == "upcoming"
+
+    def is_recently_finished(self, days: int = 7, now=None) -> bool:
+        now = now or request_now()
         end = self._aware(self.end_at)
         return end < now and end >= (now - timedelta(days=days))
-    
+
+    # --- indexed state queries (one range scan each, independent of history size) ---
+    # Each query constrains a single indexed column so the planner (SQLite has
+    # no stats by default) cannot pick the other index and walk all history;
+    # the few rows it returns are then checked with state().
+    @classmethod
+    def open_elections(cls, now=None) -> list["Election"]:
+        now = now or request_now()
+        rows = cls.query.filter(cls.end_at >= now, cls.closed_at.is_(None)).all()
+        return [e for e in rows if e.state(now) == "open"]
+
+    @classmethod
+    def upcoming_elections(cls, now=None) -> list["Election"]:
+        now = now or request_now()
+        return cls.query.filter(cls.start_at > now).all()
+
+    @classmethod
+    def recently_finished_elections(cls, days: int = 7, now=None) -> list["Election"]:
+        """Ended within `days`, or closed early and not yet past `end_at`."""
+        now = now or request_now()
+        rows = cls.query.filter(
+            cls.end_at >= now - timedelta(days=days),
+            or_(cls.end_at < now, cls.closed_at.isnot(None)),
+        ).all()
+        return [e for e in rows if e.state(now) == "closed"]
+
 class Vote(db.Model):
     __tablename__ = 'votes'
     id = db.Column(db.Integer, primary_key=True)
@@ -79,3 +140,58 @@ class VotingRegistry(db.Model):
     __table_args__ = (
         db.UniqueConstraint('election_id', 'kennitala', name='uniq_election_voter'),
     )
+
+class ChainSummary(db.Model):
+    """Running head of an election's vote hash chain, maintained by cast_vote."""
+    __tablename__ = 'chain_summaries'
+    election_id = db.Column(db.Integer, db.ForeignKey('elections.id'), primary_key=True)
+    head = db.Column(db.String(64), nullable=True)
+    length = db.Column(db.Integer, nullable=False, default=0)
+    checkpoint_every = db.Column(db.Integer, nullable=False)
+    # sha256 fold of vote hashes since the last checkpoint
+    segment_acc = db.Column(db.String(64), nullable=True)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+class ChainCheckpoint(db.Model):
+    __tablename__ = 'chain_checkpoints'
+    election_id = db.Column(db.Integer, db.ForeignKey('elections.id'), primary_key=True)
+    seq = db.Column(db.Integer, primary_key=True)
+    length = db.Column(db.Integer, nullable=False)
+    head = db.Column(db.String(64), nullable=False)
+    segment_digest = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+class ElectionArchive(db.Model):
+    """Summary left behind when an election's ballots move to an archive file (services/archive.py)."""
+    __tablename__ = 'election_archives'
+    election_id = db.Column(db.Integer, db.ForeignKey('elections.id'), primary_key=True)
+    path = db.Column(db.String(500), nullable=False)
+    file_sha256 = db.Column(db.String(64), nullable=False)
+    vote_count = db.Column(db.Integer, nullable=False)
+    receipt_count = db.Column(db.Integer, nullable=False)
+    chain_head = db.Column(db.String(64), nullable=True)
+    archived_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+class ArchivedReceipt(db.Model):
+    """A voter's receipt kept after archiving; keyed by hashing.voter_lookup_key, not kennitala."""
+    __tablename__ = 'archived_receipts'
+    election_id = db.Column(db.Integer, db.ForeignKey('elections.id'), primary_key=True)
+    voter_key = db.Column(db.String(64), primary_key=True)
+    receipt = db.Column(db.String(64), nullable=False)
+
+class LoginAttempt(db.Model):
+    """Pending/finished Auðkenni login started by main.login (see services/login_flow.py)."""
+    __tablename__ = 'login_attempts'
+    id = db.Column(db.String(64), primary_key=True)
+    status = db.Column(db.String(16), nullable=False)
+    national_register_id = db.Column(db.String(20), nullable=True)
+    name = db.Column(db.String(200), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+
+class SessionRecord(db.Model):
+    """Server-side session data (only used when SESSION_BACKEND=db)."""
+    __tablename__ = 'server_sessions'
+    id = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
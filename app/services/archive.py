@@ -0,0 +1,304 @@
+# app/services/archive.py
+# Cold storage for finished elections. Ballots and registry receipts move
+# out of `votes` / `voting_registry` into one gzip'd JSON-lines file per
+# election; the live DB keeps an `election_archives` summary row.
+#
+# File layout (one JSON object per line):
+#   {"kind": "header", "format": 1, "election": {...}, "archived_at": ...}
+#   {"kind": "vote", "id", "vote_json", "vote_date", "prev_hash", "vote_hash"}   (chain order)
+#   {"kind": "receipt", "receipt": <hex>}                                         (sorted)
+#   {"kind": "footer", "chain_head", "chain_length", "receipt_count", "content_sha256"}
+# content_sha256 covers every byte before the footer line. Registry rows are
+# stored as the receipts voters were shown, so the file holds no kennitala;
+# `archived_receipts` keeps each voter's receipt under a keyed lookup hash so
+# the election page can still show it.
+import gzip
+import hashlib
+import json
+import os
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime, UTC
+from pathlib import Path
+
+from flask import current_app
+
+from app import db
+from app.services.hashing import compute_registry_receipt, compute_vote_hash, voter_lookup_key
+
+FORMAT = 1
+
+class ArchiveError(Exception):
+    pass
+
+@dataclass(frozen=True)
+class ArchivedVote:
+    """Read-only stand-in for a Vote row (same attributes the export uses)."""
+    id: int
+    vote_json: str
+    vote_date: date
+    prev_hash: str | None
+    vote_hash: str
+
+def archive_dir() -> Path:
+    from app.services.snapshots import export_dir
+    out = export_dir().parent / "election_archives"
+    out.mkdir(parents=True, exist_ok=True)
+    return out
+
+def _line(obj: dict) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+
+def _iso(dt):
+    if dt is None:
+        return None
+    return (dt.replace(tzinfo=UTC) if dt.tzinfo is None else dt.astimezone(UTC)).isoformat()
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+# --- reading ---
+
+# what reading a damaged file raises: missing / not gzip / truncated / bad
+# deflate data, a line that is not JSON or not an object, a malformed record
+READ_ERRORS = (OSError, EOFError, zlib.error, ValueError, KeyError, TypeError)
+
+def _read_lines(path: Path):
+    with gzip.open(path, "rb") as f:
+        for raw in f:
+            obj = json.loads(raw)
+            if not isinstance(obj, dict):
+                raise ValueError(f"line is not a JSON object: {raw[:40]!r}")
+            yield raw, obj
+
+def verify_archive_file(path) -> dict:
+    """
+    Offline check of an archive file (needs nothing but the file): content
+    hash, hash chain recomputed from the ballots and the election salt, and
+    the counts/head recorded in the footer.
+    """
+    path = Path(path)
+    h = hashlib.sha256()
+    header = footer = None
+    election_id = salt = None
+    head, length, receipts, chain_ok = None, 0, 0, True
+    problems = []
+    try:
+        for raw, obj in _read_lines(path):
+            kind = obj.get("kind")
+            if kind == "footer":
+                footer = obj
+                break
+            h.update(raw)
+            if kind == "header":
+                header = obj
+                election_id = obj["election"]["id"]
+                salt = obj["election"]["salt"]
+            elif kind == "vote":
+                if obj["prev_hash"] != head or compute_vote_hash(salt, obj["vote_json"], obj["prev_hash"]) != obj["vote_hash"]:
+                    chain_ok = False
+                head = obj["vote_hash"]
+                length += 1
+            elif kind == "receipt":
+                receipts += 1
+    except READ_ERRORS as e:
+        problems.append(f"unreadable after {length} votes: {type(e).__name__}: {e}")
+
+    if header is None or header.get("format") != FORMAT:
+        problems.append("missing or unknown header")
+    if footer is None:
+        problems.append("missing footer (truncated file?)")
+    else:
+        if footer.get("content_sha256") != h.hexdigest():
+            problems.append("content hash mismatch")
+        if footer.get("chain_head") != head or footer.get("chain_length") != length:
+            problems.append("chain head/length mismatch")
+        if footer.get("receipt_count") != receipts:
+            problems.append("receipt count mismatch")
+    if not chain_ok:
+        problems.append("vote hash chain broken")
+
+    return {
+        "election_id": election_id,
+        "chain_head": head,
+        "chain_length": length,
+        "receipt_count": receipts,
+        "ok": not problems,
+        "problems": problems,
+    }
+
+def get_archive(election_id: int):
+    from app.models import ElectionArchive
+    return db.session.get(ElectionArchive, election_id)
+
+def iter_votes(election_id: int):
+    """Votes in chain order, from the live table or the archive file."""
+    from app.models import Vote
+    arch = get_archive(election_id)
+    if arch is None:
+        yield from (Vote.query.filter_by(election_id=election_id)
+                    .order_by(Vote.id.asc())
+                    .yield_per(1000))
+        return
+    for _, obj in _read_lines(Path(arch.path)):
+        if obj.get("kind") == "vote":
+            yield ArchivedVote(
+                id=obj["id"],
+                vote_json=obj["vote_json"],
+                vote_date=date.fromisoformat(obj["vote_date"]),
+                prev_hash=obj["prev_hash"],
+                vote_hash=obj["vote_hash"],
+            )
+
+def archived_receipts(election_id: int) -> set[str] | None:
+    """Registry receipts from the archive, or None if the election is not archived."""
+    arch = get_archive(election_id)
+    if arch is None:
+        return None
+    return {obj["receipt"] for _, obj in _read_lines(Path(arch.path)) if obj.get("kind") == "receipt"}
+
+def receipt_for_voter(election, kennitala: str) -> str | None:
+    """The receipt this voter was shown for an archived election, or None if they did not vote."""
+    from app.models import ArchivedReceipt
+    key = voter_lookup_key(election.id, kennitala, salt=election.salt,
+                           secret=current_app.config.get("SECRET_KEY"))
+    row = db.session.get(ArchivedReceipt, (election.id, key))
+    return row.receipt if row is not None else None
+
+# --- writing ---
+
+def archive_election(election_id: int) -> Path:
+    """
+    Move a finished election's ballots and registry into an archive file.
+    The file is written, verified and made read-only before the live rows
+    are deleted; if the DB step fails the file is removed again.
+    """
+    from app.models import ArchivedReceipt, Election, ElectionArchive, Vote, VotingRegistry
+    from app.services import chain, snapshots
+
+    election = db.session.get(Election, election_id)
+    if election is None:
+        raise ArchiveError(f"election {election_id} not found")
+    if election.state() != "closed":
+        raise ArchiveError(f"election {election_id} is not finished")
+    if get_archive(election_id) is not None:
+        raise ArchiveError(f"election {election_id} is already archived")
+
+    # Results and the chain summary must outlive the rows they are built from
+    snapshots.build_snapshot(election_id)
+    chain.summary(election_id)
+
+    secret = current_app.config.get("SECRET_KEY")
+    tmp = archive_dir() / f".election_{election_id}.{os.getpid()}.tmp"
+    h = hashlib.sha256()
+    head, length = None, 0
+
+    with gzip.open(tmp, "wb") as f:
+        def put(obj):
+            raw = _line(obj)
+            h.update(raw)
+            f.write(raw)
+
+        put({
+            "kind": "header",
+            "format": FORMAT,
+            "archived_at": datetime.now(UTC).replace(microsecond=0).isoformat(),
+            "election": {
+                "id": election.id,
+                "title": election.title,
+                "salt": election.salt,
+                "options_json": election.options_json,
+                "start_at": _iso(election.start_at),
+                "end_at": _iso(election.end_at),
+                "closed_at": _iso(election.closed_at),
+            },
+        })
+        for v in (Vote.query.filter_by(election_id=election_id)
+                  .order_by(Vote.id.asc()).yield_per(1000)):
+            put({"kind": "vote", "id": v.id, "vote_json": v.vote_json,
+                 "vote_date": v.vote_date.isoformat(), "prev_hash": v.prev_hash, "vote_hash": v.vote_hash})
+            head, length = v.vote_hash, length + 1
+
+        # same inputs as election_detail, so these are the receipts voters hold
+        lookup = {
+            voter_lookup_key(election_id, kt, salt=election.salt, secret=secret):
+                compute_registry_receipt(election_id, kt, ts, salt=election.salt, secret=secret)
+            for kt, ts in db.session.query(VotingRegistry.kennitala, VotingRegistry.timestamp)
+                                    .filter_by(election_id=election_id)
+        }
+        receipts = sorted(lookup.values())
+        for r in receipts:
+            put({"kind": "receipt", "receipt": r})
+
+        f.write(_line({"kind": "footer", "chain_head": head, "chain_length": length,
+                       "receipt_count": len(receipts), "content_sha256": h.hexdigest()}))
+
+    check = verify_archive_file(tmp)
+    if not check["ok"] or check["chain_length"] != length:
+        tmp.unlink()
+        raise ArchiveError(f"archive of election {election_id} failed verification: {check['problems']}")
+
+    final = archive_dir() / f"election_{election_id}_{(head or 'empty')[:12]}.jsonl.gz"
+    if final.exists():
+        tmp.unlink()
+        raise ArchiveError(f"{final} already exists")
+    tmp.chmod(0o444)
+    tmp.rename(final)
+
+    try:
+        db.session.add(ElectionArchive(
+            election_id=election_id,
+            path=str(final),
+            file_sha256=_sha256_file(final),
+            vote_count=length,
+            receipt_count=len(receipts),
+            chain_head=head,
+            archived_at=datetime.now(UTC),
+        ))
+        db.session.add_all(ArchivedReceipt(election_id=election_id, voter_key=k, receipt=r)
+                           for k, r in lookup.items())
+        Vote.query.filter_by(election_id=election_id).delete()
+        VotingRegistry.query.filter_by(election_id=election_id).delete()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        final.chmod(0o644)
+        final.unlink()
+        raise
+    return final
+
+def retire_archive_file(path) -> Path | None:
+    """
+    Move a deleted election's archive file aside (`<name>.deleted-<timestamp>`)
+    so it is no longer tied to an election but the ballots are kept for audit.
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%SZ")
+    target = path.with_name(f"{path.name}.deleted-{stamp}")
+    path.rename(target)
+    return target
+
+def verify_archived_election(election_id: int) -> dict:
+    """verify_archive_file plus a check that the file is the one recorded in the DB."""
+    arch = get_archive(election_id)
+    if arch is None:
+        raise ArchiveError(f"election {election_id} is not archived")
+    report = verify_archive_file(arch.path)
+    try:
+        file_sha256 = _sha256_file(Path(arch.path))
+    except OSError as e:
+        file_sha256 = None
+        report["problems"].append(f"cannot read file: {e}")
+    if file_sha256 != arch.file_sha256:
+        report["ok"] = False
+        report["problems"].append("file hash differs from election_archives row")
+    if report["chain_head"] != arch.chain_head or report["chain_length"] != arch.vote_count:
+        report["ok"] = False
+        report["problems"].append("chain differs from election_archives row")
+    return report
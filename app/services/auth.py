@@ -4,18 +4,19 @@
 from flask import session
 from functools import wraps
 from flask import g, abort
-from audkenni import see_some_id
+from app.services.sessions import regenerate_session
 
 def set_authenticated(person: dict, is_admin: bool):
     ssn = person["nationalRegisterId"]
     name = person["name"]
-    signature = person["signature"]
+    regenerate_session()
     session['kennitala'] = ssn
     session['nafn'] = name
     session['is_admin'] = bool(is_admin)
 
 def logout():
     session.clear()
+    regenerate_session()
 
 def current_kennitala() -> str | None:
     return session.get('kennitala')
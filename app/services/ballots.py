@@ -0,0 +1,102 @@
+# app/services/ballots.py
+# Ballot validation compiled once per distinct option list and shared by
+# cast_vote, the JSON ballot API and re-validation of stored ballots when
+# tallying. Ranked ballots are checked in one linear pass: an option -> index
+# map replaces list membership, and an int bitset tracks options already used.
+from functools import lru_cache
+
+YES_NO = ("YES", "NO")
+BLANK = (None, "")
+
+class BallotError(ValueError):
+    """Ballot rejected; str(e) is the message shown to the voter."""
+
+class BallotValidator:
+    def __init__(self, options: tuple[str, ...]):
+        self.options = options
+        self.index = {opt: i for i, opt in enumerate(options)}
+        self.yesno = len(options) == 1
+
+    # --- ranked ---
+    def check_ranking(self, ranks) -> list[str]:
+        """
+        `ranks` are the submitted values for positions 1..N in order ("" or
+        None for blank; any other non-string is invalid). Rank 1 is required,
+        no gaps, no duplicates, only known options. Returns the ranking
+        without the trailing blanks.
+        """
+        ranks = list(ranks)
+        if not ranks or ranks[0] in BLANK or (isinstance(ranks[0], str) and ranks[0] not in self.index):
+            raise BallotError("Rank 1 must be selected.")
+        if len(ranks) > len(self.options):
+            raise BallotError("Invalid or duplicate ranking.")
+
+        used = 0
+        ranking = []
+        encountered_blank = False
+        for val in ranks:
+            if val in BLANK:
+                encountered_blank = True
+                continue
+            if not isinstance(val, str):
+                raise BallotError("Invalid or duplicate ranking.")
+            if encountered_blank:
+                raise BallotError("No gaps allowed: fill earlier ranks before later ones.")
+            i = self.index.get(val)
+            if i is None or used >> i & 1:
+                raise BallotError("Invalid or duplicate ranking.")
+            used |= 1 << i
+            ranking.append(val)
+        return ranking
+
+    # --- yes/no ---
+    def check_yesno(self, choice) -> str:
+        if choice not in YES_NO:
+            raise BallotError("Invalid yes/no vote.")
+        return choice
+
+    # --- payloads ---
+    def payload(self, *, choice=None, ranks=None) -> dict:
+        """Build the canonical vote payload (the dict that gets hashed and stored)."""
+        if self.yesno:
+            return {"type": "yesno", "vote": self.check_yesno(choice), "option": self.options[0]}
+        return {"type": "ranked", "ranking": self.check_ranking(ranks or []), "options": list(self.options)}
+
+    def payload_from_form(self, form) -> dict:
+        if self.yesno:
+            return self.payload(choice=form.get("yesno"))
+        return self.payload(ranks=(form.get(f"rank_{i}") for i in range(1, len(self.options) + 1)))
+
+    def payload_from_json(self, data) -> dict:
+        """{"vote": "YES"|"NO"} for yes/no, {"ranking": [...]} for ranked."""
+        if not isinstance(data, dict):
+            raise BallotError("Ballot must be a JSON object.")
+        if self.yesno:
+            return self.payload(choice=data.get("vote"))
+        ranking = data.get("ranking")
+        if not isinstance(ranking, list):
+            raise BallotError("Rank 1 must be selected.")
+        return self.payload(ranks=ranking)
+
+    def check_stored(self, payload: dict) -> None:
+        """Re-validate a ballot read back from `votes` (raises BallotError)."""
+        if self.yesno:
+            if payload.get("type") != "yesno" or payload.get("option") != self.options[0]:
+                raise BallotError("Ballot does not match this election.")
+            self.check_yesno(payload.get("vote"))
+            return
+        if payload.get("type") != "ranked" or tuple(payload.get("options") or ()) != self.options:
+            raise BallotError("Ballot does not match this election.")
+        ranking = payload.get("ranking")
+        if not isinstance(ranking, list):
+            raise BallotError("Rank 1 must be selected.")
+        self.check_ranking(ranking)
+
+@lru_cache(maxsize=256)
+def _compile(options_json: str) -> BallotValidator:
+    from app.models import _parse_options
+    return BallotValidator(_parse_options(options_json))
+
+def validator_for(election) -> BallotValidator:
+    """Cached validator for the election's options (options_json is immutable)."""
+    return _compile(election.options_json)
@@ -0,0 +1,162 @@
+# app/services/chain.py
+# Cached head of each election's vote hash chain plus periodic checkpoints,
+# so observers can poll the chain without anyone scanning `votes`.
+#
+# Every `checkpoint_every` votes a checkpoint (seq, length, head,
+# segment_digest) is recorded; segment_digest folds the vote hashes of that
+# segment: d = sha256(d_prev_in_segment + vote_hash), starting from "".
+import hashlib
+from datetime import datetime, date, UTC
+
+from flask import current_app
+from sqlalchemy import exists, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.services.hashing import compute_vote_hash
+
+class ChainConflict(Exception):
+    """Another vote extended the chain first; roll back and retry."""
+
+class ElectionClosed(Exception):
+    """The election closed (or passed end_at) before the vote was stored; roll back."""
+
+def fold(acc: str | None, vote_hash: str) -> str:
+    return hashlib.sha256(f"{acc or ''}{vote_hash}".encode("ascii")).hexdigest()
+
+def _now():
+    return datetime.now(UTC)
+
+def init_summary(election_id: int) -> None:
+    """Add an empty summary for a new election (caller commits)."""
+    from app.models import ChainSummary
+    db.session.add(ChainSummary(
+        election_id=election_id,
+        head=None,
+        length=0,
+        checkpoint_every=current_app.config.get("CHAIN_CHECKPOINT_EVERY", 100),
+        segment_acc=None,
+        updated_at=_now(),
+    ))
+
+def _bootstrap(election_id: int) -> None:
+    """One-off scan for elections that predate chain summaries."""
+    from app.models import ChainSummary, ChainCheckpoint, Vote
+    every = current_app.config.get("CHAIN_CHECKPOINT_EVERY", 100)
+    head, length, acc = None, 0, None
+    rows = (db.session.query(Vote.vote_hash)
+            .filter_by(election_id=election_id)
+            .order_by(Vote.id.asc())
+            .execution_options(yield_per=5000))
+    for (vote_hash,) in rows:
+        head, length, acc = vote_hash, length + 1, fold(acc, vote_hash)
+        if length % every == 0:
+            db.session.add(ChainCheckpoint(
+                election_id=election_id, seq=length // every, length=length,
+                head=head, segment_digest=acc, created_at=_now(),
+            ))
+            acc = None
+    db.session.add(ChainSummary(
+        election_id=election_id, head=head, length=length,
+        checkpoint_every=every, segment_acc=acc, updated_at=_now(),
+    ))
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # a concurrent request bootstrapped it first
+        db.session.rollback()
+        raise ChainConflict(election_id)
+
+def _read(election_id: int):
+    from app.models import ChainSummary
+    # column select: always reads the row from the DB, never a stale identity-map copy
+    return db.session.execute(
+        select(ChainSummary.head, ChainSummary.length, ChainSummary.checkpoint_every, ChainSummary.segment_acc)
+        .where(ChainSummary.election_id == election_id)
+    ).first()
+
+def summary(election_id: int):
+    """(head, length, checkpoint_every, segment_acc) for the election, bootstrapping if needed."""
+    row = _read(election_id)
+    if row is None:
+        try:
+            _bootstrap(election_id)
+            db.session.commit()
+        except ChainConflict:
+            pass
+        row = _read(election_id)
+    return row
+
+def append_vote(election, canonical_vote: str):
+    """
+    Hash `canonical_vote` onto the chain head, add the Vote row and advance
+    the summary with a compare-and-set on `length`. Raises ChainConflict if
+    another vote won the race; the caller rolls back and retries. Raises
+    ElectionClosed if the election stopped accepting votes after the caller
+    checked, so no vote lands behind a result snapshot. Caller commits.
+    Returns the new chain length.
+    """
+    from app.models import ChainSummary, ChainCheckpoint, Election, Vote
+    row = _read(election.id)
+    if row is None:
+        _bootstrap(election.id)
+        row = _read(election.id)
+    head, length, every, acc = row
+
+    vote_hash = compute_vote_hash(election.salt, canonical_vote, head)
+    new_length = length + 1
+    new_acc = fold(acc, vote_hash)
+    checkpoint = new_length % every == 0
+
+    # exact time, as build_snapshot uses: once a snapshot sees the election
+    # finished, no later vote can pass this check
+    now = _now()
+    still_open = exists().where(
+        Election.id == election.id,
+        Election.closed_at.is_(None),
+        Election.end_at >= now,
+    )
+    res = db.session.execute(
+        update(ChainSummary)
+        .where(ChainSummary.election_id == election.id, ChainSummary.length == length, still_open)
+        .values(head=vote_hash, length=new_length,
+                segment_acc=None if checkpoint else new_acc, updated_at=now)
+    )
+    if res.rowcount != 1:
+        if not db.session.query(still_open).scalar():
+            raise ElectionClosed(election.id)
+        raise ChainConflict(election.id)
+
+    if checkpoint:
+        db.session.add(ChainCheckpoint(
+            election_id=election.id, seq=new_length // every, length=new_length,
+            head=vote_hash, segment_digest=new_acc, created_at=_now(),
+        ))
+
+    # Keep vote_date as a date (legacy), but timestamps should be aware UTC
+    v = Vote(
+        election_id=election.id,
+        vote_json=canonical_vote,
+        vote_date=date.today(),
+        prev_hash=head,
+        vote_hash=vote_hash,
+    )
+    db.session.add(v)
+    return new_length
+
+def checkpoints_since(election_id: int, since: int = 0, limit: int = 1000) -> list[dict]:
+    from app.models import ChainCheckpoint
+    rows = (ChainCheckpoint.query
+            .filter(ChainCheckpoint.election_id == election_id, ChainCheckpoint.seq > since)
+            .order_by(ChainCheckpoint.seq.asc())
+            .limit(limit)
+            .all())
+    return [
+        {"seq": c.seq, "length": c.length, "head": c.head, "segment_digest": c.segment_digest}
+        for c in rows
+    ]
+
+def delete_chain(election_id: int) -> None:
+    from app.models import ChainSummary, ChainCheckpoint
+    ChainCheckpoint.query.filter_by(election_id=election_id).delete()
+    ChainSummary.query.filter_by(election_id=election_id).delete()
@@ -0,0 +1,114 @@
+# app/services/election_import.py
+# Bulk creation of elections from JSON or CSV. Every record is validated
+# before anything is written; one bad record rejects the whole batch.
+import csv
+import io
+import json
+import secrets
+from datetime import datetime, UTC
+
+from app.controllers._datetime_helpers import parse_local_to_utc
+
+FIELDS = ("title", "description", "image_url", "options", "start_at", "end_at", "eligibility_cutoff")
+
+def records_from_json(payload) -> list[dict]:
+    """Accept a list of election objects or {"elections": [...]}."""
+    if isinstance(payload, dict):
+        payload = payload.get("elections")
+    if not isinstance(payload, list):
+        raise ValueError("Expected a list of elections or {\"elections\": [...]}")
+    return payload
+
+def records_from_csv(text: str) -> list[dict]:
+    """
+    Header row with FIELDS (description, image_url, eligibility_cutoff optional).
+    Options are separated by '|' or by line breaks inside a quoted cell.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    missing = {"title", "options", "start_at", "end_at"} - set(reader.fieldnames or [])
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(sorted(missing))}")
+    records = []
+    for row in reader:
+        rec = {k: (row.get(k) or "").strip() for k in FIELDS}
+        raw = rec["options"]
+        rec["options"] = raw.split("|") if "|" in raw else raw.splitlines()
+        records.append(rec)
+    return records
+
+def _parse_dt(value, field: str):
+    """'YYYY-MM-DDTHH:MM' is Reykjavik local (as in the form); ISO 8601 with an offset is taken as-is."""
+    if not value or not isinstance(value, str):
+        raise ValueError(f"{field} is required")
+    try:
+        dt = datetime.fromisoformat(value.strip())
+    except ValueError:
+        raise ValueError(f"{field}: invalid datetime {value!r}")
+    if dt.tzinfo is None:
+        return parse_local_to_utc(dt.strftime("%Y-%m-%dT%H:%M"))
+    return dt.astimezone(UTC).replace(second=0, microsecond=0)
+
+def _parse_options(value) -> list[str]:
+    if isinstance(value, str):
+        value = value.split("\n")
+    if not isinstance(value, list):
+        raise ValueError("options must be a list")
+    if not all(isinstance(o, str) for o in value):
+        raise ValueError("options must be strings")
+    options = [o.strip() for o in value if o.strip()]
+    if not options:
+        raise ValueError("at least one option is required")
+    if len(set(options)) != len(options):
+        raise ValueError("duplicate options")
+    return options
+
+def _text(rec: dict, field: str) -> str:
+    """Optional string field, stripped ('' if missing or null)."""
+    value = rec.get(field)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    return value.strip()
+
+def build_election(rec: dict):
+    """Validate one record and return an unsaved Election (raises ValueError)."""
+    from app.models import Election
+    if not isinstance(rec, dict):
+        raise ValueError("record must be an object")
+    title = _text(rec, "title")
+    if not title:
+        raise ValueError("title is required")
+    options = _parse_options(rec.get("options"))
+    start_at = _parse_dt(rec.get("start_at"), "start_at")
+    end_at = _parse_dt(rec.get("end_at"), "end_at")
+    if end_at <= start_at:
+        raise ValueError("end_at must be after start_at")
+
+    cutoff_date = None
+    cutoff_str = _text(rec, "eligibility_cutoff")
+    if cutoff_str:
+        try:
+            cutoff_date = datetime.strptime(cutoff_str, "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError("eligibility_cutoff must be YYYY-MM-DD")
+
+    return Election(
+        title=title,
+        description=_text(rec, "description"),
+        image_url=_text(rec, "image_url") or None,
+        options_json=json.dumps(options),
+        start_at=start_at, end_at=end_at,
+        eligibility_cutoff=cutoff_date,
+        salt=secrets.token_hex(16),
+    )
+
+def build_elections(records: list[dict]):
+    """Returns (elections, errors); errors is a list of {"index", "error"}."""
+    elections, errors = [], []
+    for i, rec in enumerate(records):
+        try:
+            elections.append(build_election(rec))
+        except ValueError as e:
+            errors.append({"index": i, "error": str(e)})
+    return elections, errors
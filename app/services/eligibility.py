@@ -1,7 +1,6 @@
 # app/services/eligibility.py
 import re
 from urllib.parse import quote
-import requests
 from datetime import datetime, date
 
 def _normalize_search(field: str, search: str) -> str:
@@ -15,6 +14,7 @@ def _normalize_search(field: str, search: str) -> str:
 def _fetch_member_added(base: str, api_key: str, field: str, search: str, timeout: float = 5.0) -> str | None:
     if not base or not api_key:
         return None
+    import requests  # lazy: only needed when USE_ICEPIRATE is on
     norm = _normalize_search(field, search)
     url = f"{base.rstrip('/')}/member/api/get/{field}/{quote(norm, safe='')}/"
     resp = requests.post(url, data={"json_api_key": api_key}, timeout=timeout)
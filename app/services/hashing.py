@@ -1,6 +1,7 @@
 
 import json
 import hashlib
+import hmac
 from datetime import UTC
 
 def canonicalize_vote(vote_payload: dict) -> str:
@@ -27,4 +28,33 @@ def compute_registry_receipt(
         payload += f"|S:{salt}"
     if secret:
         payload += f"|K:{secret}"
-    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
\ No newline at end of file
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def voter_lookup_key(
+    election_id: int,
+    kennitala: str,
+    *, salt: str,
+    secret: str | None = None
+) -> str:
+    """
+    Keyed hash identifying a voter within one election, used to find their
+    receipt once the registry row (and its kennitala) has been archived.
+    """
+    key = f"LOOKUP|S:{salt}|K:{secret or ''}".encode("utf-8")
+    return hmac.new(key, f"{election_id}|{kennitala}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+def voter_option_order(
+    options: list[str],
+    election_id: int,
+    kennitala: str,
+    *, salt: str,
+    secret: str | None = None
+) -> list[str]:
+    """
+    Per-voter display order of `options`, stable across requests and workers.
+    Each option index is ranked by an HMAC keyed on (election, voter, salt),
+    so nothing needs to be remembered in the session.
+    """
+    key = f"ORDER|{election_id}|{kennitala}|S:{salt}|K:{secret or ''}".encode("utf-8")
+    ranks = [hmac.new(key, str(i).encode("ascii"), hashlib.sha256).digest() for i in range(len(options))]
+    return [opt for _, opt in sorted(zip(ranks, options), key=lambda pair: pair[0])]
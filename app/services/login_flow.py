@@ -0,0 +1,167 @@
+# app/services/login_flow.py
+# Non-blocking Auðkenni login. `see_some_id` waits for the user to confirm on
+# their phone, so it runs in a small per-worker thread pool; the result is
+# written to `login_attempts` so whichever worker serves the status poll can
+# finish the login. A concurrency cap and a circuit breaker keep a slow or
+# failing identity provider from piling up threads.
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, UTC, timedelta
+
+from flask import current_app
+
+from app import db
+
+PENDING, OK, FAILED = "pending", "ok", "failed"
+
+class LoginUnavailable(Exception):
+    """Login cannot be started right now (breaker open or at capacity)."""
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures; while open every call is
+    refused for `cooldown` seconds, then a single trial call is let through.
+    """
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._trial and time.monotonic() - self._opened_at >= self.cooldown:
+                self._trial = True  # half-open
+                return True
+            return False
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self._failures = 0
+                self._opened_at = None
+            else:
+                self._failures += 1
+                if self._trial or self._failures >= self.threshold:
+                    self._opened_at = time.monotonic()
+            self._trial = False
+
+    def cancel(self) -> None:
+        """Give back a trial call that allow() granted but that never ran."""
+        with self._lock:
+            self._trial = False
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+_lock = threading.Lock()
+_executor: ThreadPoolExecutor | None = None
+_slots: threading.BoundedSemaphore | None = None
+_breaker: CircuitBreaker | None = None
+
+def _init(app) -> None:
+    global _executor, _slots, _breaker
+    with _lock:
+        if _executor is not None:
+            return
+        cap = app.config.get("LOGIN_MAX_CONCURRENT", 50)
+        _executor = ThreadPoolExecutor(max_workers=cap, thread_name_prefix="audkenni")
+        _slots = threading.BoundedSemaphore(cap)
+        _breaker = CircuitBreaker(
+            app.config.get("LOGIN_BREAKER_THRESHOLD", 5),
+            app.config.get("LOGIN_BREAKER_COOLDOWN", 30.0),
+        )
+
+def identify(phone: str, purpose: str) -> dict:
+    """The blocking identity call (separate so it can be swapped for a stub)."""
+    from audkenni import see_some_id  # lazy: keeps the client out of worker start-up
+    return see_some_id(phone, purpose)
+
+def _is_provider_failure(exc: BaseException) -> bool:
+    """
+    Whether a failed identity check says something about the provider's
+    health. Transport errors (connection, timeout; OSError covers requests'
+    exceptions), HTTP 5xx and malformed answers count toward the breaker.
+    The user cancelling, not confirming in time, a number without an
+    electronic ID or an HTTP 4xx are normal outcomes and do not.
+    """
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is not None:
+        return status >= 500
+    return isinstance(exc, (OSError, KeyError, TypeError))
+
+def _run(app, attempt_id: str, phone: str, purpose: str) -> None:
+    from app.models import LoginAttempt
+    try:
+        try:
+            person = identify(phone, purpose)
+            values = {
+                "status": OK,
+                "national_register_id": person["nationalRegisterId"],
+                "name": person["name"],
+            }
+            provider_ok = True
+        except Exception as e:
+            values = {"status": FAILED, "error": str(e)[:500]}
+            provider_ok = not _is_provider_failure(e)
+        # A rejection is still an answer from the provider, so it also ends a half-open trial
+        _breaker.record(provider_ok)
+        with app.app_context():
+            LoginAttempt.query.filter_by(id=attempt_id).update(values)
+            db.session.commit()
+    except Exception:
+        app.logger.exception("login attempt %s failed to record", attempt_id)
+    finally:
+        _slots.release()
+
+def start(phone: str, purpose: str) -> str:
+    """Queue an identity check for `phone`; returns the attempt id to poll."""
+    from app.models import LoginAttempt
+    app = current_app._get_current_object()
+    _init(app)
+
+    # Slot first: a half-open trial granted by allow() must always reach record() or cancel()
+    if not _slots.acquire(blocking=False):
+        raise LoginUnavailable("at capacity")
+    if not _breaker.allow():
+        _slots.release()
+        raise LoginUnavailable("breaker open")
+
+    try:
+        _sweep(app)
+        attempt = LoginAttempt(id=secrets.token_urlsafe(32), status=PENDING, created_at=datetime.now(UTC))
+        db.session.add(attempt)
+        db.session.commit()
+        _executor.submit(_run, app, attempt.id, phone, purpose)
+    except Exception:
+        _breaker.cancel()
+        _slots.release()
+        raise
+    return attempt.id
+
+def status(attempt_id: str | None):
+    """The LoginAttempt row (fresh from the DB) or None if unknown/expired."""
+    from app.models import LoginAttempt
+    if not attempt_id:
+        return None
+    db.session.expire_all()
+    return db.session.get(LoginAttempt, attempt_id)
+
+def discard(attempt_id: str) -> None:
+    from app.models import LoginAttempt
+    LoginAttempt.query.filter_by(id=attempt_id).delete()
+    db.session.commit()
+
+def _sweep(app) -> None:
+    """Drop attempts nobody came back for."""
+    from app.models import LoginAttempt
+    ttl = timedelta(seconds=app.config.get("LOGIN_ATTEMPT_TTL", 600))
+    LoginAttempt.query.filter(LoginAttempt.created_at < datetime.now(UTC) - ttl).delete()
@@ -0,0 +1,69 @@
+# app/services/receipts.py
+# Bulk receipt checks for auditors: recompute every registry receipt for an
+# election once, then match submitted receipts against that set.
+import re
+from typing import Iterable
+
+from flask import current_app
+
+from app import db
+from app.services.archive import archived_receipts
+from app.services.hashing import compute_registry_receipt
+
+_HEX64 = re.compile(r"^[0-9a-f]{64}$")
+
+def parse_receipts(lines: Iterable[str]) -> tuple[list[str], list[str]]:
+    """
+    Split raw lines (one receipt per line; CSV with the receipt in the first
+    column is also fine) into (receipts, malformed). Blank lines are skipped.
+    """
+    receipts, malformed = [], []
+    for line in lines:
+        val = line.split(",", 1)[0].strip().strip('"').lower()
+        if not val:
+            continue
+        (receipts if _HEX64.match(val) else malformed).append(val)
+    return receipts, malformed
+
+def registry_receipts(election) -> set[str]:
+    """Recompute the receipt of every registry row of `election` (single streamed query)."""
+    from app.models import VotingRegistry
+    archived = archived_receipts(election.id)
+    if archived is not None:
+        return archived
+    secret = current_app.config.get("SECRET_KEY")
+    rows = (db.session.query(VotingRegistry.kennitala, VotingRegistry.timestamp)
+            .filter_by(election_id=election.id)
+            .execution_options(yield_per=5000))
+    # Same inputs as election_detail (timestamp as stored), so receipts match what voters were shown
+    return {
+        compute_registry_receipt(election.id, kt, ts, salt=election.salt, secret=secret)
+        for kt, ts in rows
+    }
+
+def verify_receipts(election, lines: Iterable[str]) -> dict:
+    receipts, malformed = parse_receipts(lines)
+    known = registry_receipts(election)
+
+    seen: set[str] = set()
+    matched, missing, duplicates = 0, [], 0
+    for r in receipts:
+        if r in seen:
+            duplicates += 1
+            continue
+        seen.add(r)
+        if r in known:
+            matched += 1
+        else:
+            missing.append(r)
+
+    return {
+        "election_id": election.id,
+        "registry_rows": len(known),
+        "submitted": len(receipts) + len(malformed),
+        "unique": len(seen),
+        "matched": matched,
+        "missing": missing,
+        "duplicates": duplicates,
+        "malformed": malformed,
+    }
@@ -0,0 +1,119 @@
+# app/services/sessions.py
+# Optional server-side sessions (SESSION_BACKEND=db). The cookie only carries
+# an opaque random id; session data lives in the `server_sessions` table.
+import secrets
+import time
+from datetime import datetime, UTC
+
+from flask import session
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+from app import db
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid: str | None = None, new: bool = False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.rotate = False
+
+class DbSessionInterface(SessionInterface):
+    """Store sessions in the app database, keyed by a random cookie id."""
+
+    #: Same tagged JSON as cookie sessions, so tuples, datetimes, bytes and
+    #: Markup round-trip identically whichever backend is configured.
+    serializer = session_json_serializer
+
+    def __init__(self, sweep_seconds: int = 300):
+        self.sweep_seconds = sweep_seconds
+        self._last_sweep = 0.0
+
+    def _new_sid(self) -> str:
+        return secrets.token_urlsafe(32)
+
+    def _ttl(self, app):
+        return app.permanent_session_lifetime
+
+    def open_session(self, app, request):
+        from app.models import SessionRecord
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            row = db.session.get(SessionRecord, sid)
+            if row is not None and _aware(row.expires_at) > datetime.now(UTC):
+                return ServerSession(self.serializer.loads(row.data), sid=sid)
+        return ServerSession(sid=self._new_sid(), new=True)
+
+    def save_session(self, app, session, response):
+        from app.models import SessionRecord
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified:
+                if not session.new:
+                    SessionRecord.query.filter_by(id=session.sid).delete()
+                    db.session.commit()
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = datetime.now(UTC)
+        expires_at = now + self._ttl(app)
+        if session.rotate and not session.new:
+            SessionRecord.query.filter_by(id=session.sid).delete()
+            session.sid = self._new_sid()
+            session.new = True
+            session.modified = True
+
+        if session.modified:
+            row = None if session.new else db.session.get(SessionRecord, session.sid)
+            if row is None:
+                row = SessionRecord(id=session.sid)
+                db.session.add(row)
+            row.data = self.serializer.dumps(dict(session))
+            row.expires_at = expires_at
+            db.session.commit()
+        elif not self.should_set_cookie(app, session):
+            return
+
+        self._maybe_sweep()
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+    def _maybe_sweep(self):
+        """Delete expired rows, at most once per `sweep_seconds` per worker."""
+        from app.models import SessionRecord
+        mono = time.monotonic()
+        if mono - self._last_sweep < self.sweep_seconds:
+            return
+        self._last_sweep = mono
+        SessionRecord.query.filter(SessionRecord.expires_at < datetime.now(UTC)).delete()
+        db.session.commit()
+
+def _aware(dt):
+    # SQLite returns naive datetimes; they are stored as UTC
+    return dt.replace(tzinfo=UTC) if dt.tzinfo is None else dt
+
+def regenerate_session():
+    """Issue a fresh session id on the next response (login). No-op for cookie sessions."""
+    if isinstance(session._get_current_object(), ServerSession):
+        session.rotate = True
+
+def init_app(app):
+    backend = app.config.get("SESSION_BACKEND", "cookie")
+    if backend == "db":
+        app.session_interface = DbSessionInterface(app.config.get("SESSION_SWEEP_SECONDS", 300))
+    elif backend != "cookie":
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend!r}")
@@ -0,0 +1,368 @@
+# app/services/snapshots.py
+# Close-time result snapshots: CSV export, tally and chain-head digest are
+# built once per election and stored read-only with a manifest, so the export
+# route only has to serve files when everyone asks for results at once.
+import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime, UTC
+from pathlib import Path
+
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.engine import make_url
+
+from app import db
+from app.services import chain
+from app.services.archive import iter_votes
+from app.services.ballots import BallotError, validator_for
+from app.services.hashing import compute_vote_hash
+
+MANIFEST_NAME = "manifest.json"
+BUILD_ATTEMPTS = 3
+
+class SnapshotStale(RuntimeError):
+    """The election was reopened (or deleted) while its snapshot was being built."""
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+_lock = threading.Lock()
+_pending: dict[int, Future] = {}
+_done: set[int] = set()
+_generation: dict[int, int] = {}  # bumped by retire_snapshot; a build started earlier is stale
+_last_sweep = 0.0
+
+# --- sanitize helper: remove any line breaks / weird separators and trim ---
+_WS_BREAKS = re.compile(r"[\r\n\u2028\u2029]+")  # CR, LF, Unicode LS/PS
+
+def safe_cell(val):
+    if val is None:
+        return ""
+    if isinstance(val, str):
+        # 1) remove any linebreak characters completely (replace with space)
+        s = _WS_BREAKS.sub(" ", val)
+        # 2) collapse remaining whitespace runs, trim
+        s = re.sub(r"\s+", " ", s).strip()
+        # 3) optional: strip straight quotes to avoid Excel weirdness when not quoting
+        s = s.replace('"', "").replace("'", "")
+        return s
+    return val
+
+def export_dir() -> Path:
+    """Return <directory containing the DB>/election_exports (create if missing)."""
+    uri = current_app.config["SQLALCHEMY_DATABASE_URI"]
+    url = make_url(uri)
+
+    # Default base: instance path (works for non-SQLite or unknowns)
+    base_dir = Path(current_app.instance_path)
+
+    # If SQLite file, use its actual on-disk directory
+    if url.drivername.startswith("sqlite") and url.database:
+        db_path = Path(url.database)
+        if not db_path.is_absolute():
+            # Try resolving relative to instance_path first; fallback to CWD
+            candidate = (Path(current_app.instance_path) / db_path)
+            db_path = candidate.resolve() if candidate.parent.exists() else db_path.resolve()
+        base_dir = db_path.parent
+
+    out = base_dir / "election_exports"
+    out.mkdir(parents=True, exist_ok=True)
+    return out
+
+def csv_name(election_id: int) -> str:
+    return f"election_{election_id}_votes.csv"
+
+def snapshot_path(election_id: int) -> Path:
+    return export_dir() / f"election_{election_id}"
+
+def has_snapshot(election_id: int) -> bool:
+    return (snapshot_path(election_id) / MANIFEST_NAME).is_file()
+
+def load_manifest(election_id: int) -> dict | None:
+    path = snapshot_path(election_id) / MANIFEST_NAME
+    if not path.is_file():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def write_votes_csv(f, election, votes) -> None:
+    """Write the curated CSV for `votes` (iterable of Vote rows) to file object `f`."""
+    options = election.options()
+    # No BOM, no forced quoting, LF line endings
+    writer = csv.writer(
+        f,
+        lineterminator="\n",
+        quoting=csv.QUOTE_MINIMAL,   # no quotes unless a comma sneaks in
+        escapechar="\\",
+        doublequote=False,
+    )
+
+    if len(options) == 1:
+        writer.writerow(["election_id", "vote_date", "type", "question", "vote", "prev_hash", "vote_hash"])
+        for v in votes:
+            p = json.loads(v.vote_json)
+            writer.writerow([
+                election.id,
+                v.vote_date.isoformat(),
+                safe_cell(p.get("type")),
+                safe_cell(p.get("option", "")),
+                safe_cell(p.get("vote", "")),
+                safe_cell(v.prev_hash or ""),
+                safe_cell(v.vote_hash),
+            ])
+    else:
+        header = ["election_id", "vote_date", "type"] \
+                 + [f"rank_{i+1}" for i in range(len(options))] \
+                 + ["prev_hash", "vote_hash"]
+        writer.writerow(header)
+
+        for v in votes:
+            p = json.loads(v.vote_json)
+            ranking = [safe_cell(x) for x in p.get("ranking", [])]
+            # pad to fixed width (no quotes on blanks)
+            ranking += [""] * (len(options) - len(ranking))
+            writer.writerow([
+                election.id,
+                v.vote_date.isoformat(),
+                safe_cell(p.get("type")),
+                *ranking,
+                safe_cell(v.prev_hash or ""),
+                safe_cell(v.vote_hash),
+            ])
+
+def _empty_tally(options: list[str]) -> dict:
+    if len(options) == 1:
+        return {"type": "yesno", "question": options[0], "counts": {"YES": 0, "NO": 0}, "invalid": 0}
+    return {
+        "type": "ranked",
+        "invalid": 0,
+        "first_preferences": {o: 0 for o in options},
+        "rank_counts": {o: [0] * len(options) for o in options},
+    }
+
+def _add_to_tally(tally: dict, payload: dict, validator) -> None:
+    # Re-validate what was stored; a ballot that no longer passes is counted, not tallied
+    try:
+        validator.check_stored(payload)
+    except BallotError:
+        tally["invalid"] += 1
+        return
+    if tally["type"] == "yesno":
+        choice = payload.get("vote")
+        if choice in tally["counts"]:
+            tally["counts"][choice] += 1
+        return
+    ranking = payload.get("ranking", [])
+    if ranking and ranking[0] in tally["first_preferences"]:
+        tally["first_preferences"][ranking[0]] += 1
+    for pos, opt in enumerate(ranking):
+        counts = tally["rank_counts"].get(opt)
+        if counts is not None and pos < len(counts):
+            counts[pos] += 1
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _write_snapshot(election, tmp: Path) -> int:
+    """Write CSV, tally and manifest for `election` into `tmp`; returns the chain length read."""
+    tally = _empty_tally(election.options())
+    validator = validator_for(election)
+    head = None
+    length = 0
+    chain_ok = True
+
+    def walk():
+        nonlocal head, length, chain_ok
+        # live rows, or the archive file once the election has been archived
+        for v in iter_votes(election.id):
+            # Re-verify the chain while we stream it
+            if v.prev_hash != head or compute_vote_hash(election.salt, v.vote_json, v.prev_hash) != v.vote_hash:
+                chain_ok = False
+            head = v.vote_hash
+            length += 1
+            _add_to_tally(tally, json.loads(v.vote_json), validator)
+            yield v
+
+    with open(tmp / csv_name(election.id), "w", newline="", encoding="utf-8") as f:
+        write_votes_csv(f, election, walk())
+
+    (tmp / "tally.json").write_text(
+        json.dumps(tally, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8"
+    )
+
+    files = {p.name: _sha256_file(p) for p in sorted(tmp.iterdir())}
+    manifest = {
+        "election_id": election.id,
+        "title": election.title,
+        "generated_at": datetime.now(UTC).replace(microsecond=0).isoformat(),
+        "closed_at": election._aware(election.closed_at).isoformat() if election.closed_at else None,
+        "end_at": election._aware(election.end_at).isoformat(),
+        "chain": {"head": head, "length": length, "valid": chain_ok},
+        "files": files,
+    }
+    (tmp / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+
+    for p in tmp.iterdir():
+        p.chmod(0o444)
+    return length
+
+def build_snapshot(election_id: int) -> Path:
+    """
+    Build the snapshot for a finished election (needs an app context).
+    Files are written to a scratch directory and renamed into place, so a
+    snapshot is either complete or absent; an existing one is never rewritten.
+    Before the rename the chain length read is compared with
+    `chain_summaries.length`; a vote that committed during the read means
+    the snapshot is rebuilt rather than frozen without it.
+    """
+    from app.models import Election
+
+    final = snapshot_path(election_id)
+    if (final / MANIFEST_NAME).is_file():
+        return final
+
+    election = db.session.get(Election, election_id)
+    if election is None:
+        raise LookupError(f"election {election_id} not found")
+    if election.state(datetime.now(UTC)) != "closed":
+        raise RuntimeError(f"election {election_id} is not finished")
+    closed_at = election.closed_at
+    with _lock:
+        generation = _generation.get(election_id, 0)
+
+    tmp = final.with_name(f".{final.name}.{os.getpid()}.{threading.get_ident()}")
+    for _ in range(BUILD_ATTEMPTS):
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        length = _write_snapshot(db.session.get(Election, election_id), tmp)
+        if not _still_current(election_id, closed_at, generation):
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise SnapshotStale(f"election {election_id} changed while its snapshot was built")
+        if chain.summary(election_id).length == length:
+            break
+    else:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise SnapshotStale(f"election {election_id}: chain still growing after {BUILD_ATTEMPTS} builds")
+
+    try:
+        tmp.rename(final)
+    except OSError:
+        # Another worker won the race; theirs is identical, keep it
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not (final / MANIFEST_NAME).is_file():
+            raise
+    # A reopen committed between the check and the rename would have found
+    # nothing to retire; look again and move our result aside ourselves.
+    if not _still_current(election_id, closed_at, generation):
+        _move_aside(final)
+        raise SnapshotStale(f"election {election_id} changed while its snapshot was built")
+    return final
+
+def _still_current(election_id: int, closed_at, generation: int) -> bool:
+    """Fresh read: still finished, same close time, and not retired since the build started."""
+    from app.models import Election
+    with _lock:
+        if _generation.get(election_id, 0) != generation:
+            return False
+    db.session.rollback()  # end the read transaction so commits from other workers are visible
+    election = db.session.get(Election, election_id)
+    return (election is not None
+            and election.closed_at == closed_at
+            and election.state(datetime.now(UTC)) == "closed")
+
+def _move_aside(path: Path) -> None:
+    if not path.exists():
+        return
+    stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%SZ")
+    target = path.with_name(f"{path.name}.superseded-{stamp}")
+    n = 1
+    while target.exists():  # retired twice within a second
+        target = path.with_name(f"{path.name}.superseded-{stamp}-{n}")
+        n += 1
+    path.rename(target)
+
+def retire_snapshot(election_id: int) -> None:
+    """
+    Move a snapshot aside (e.g. on reopen) so it is no longer served but kept
+    for audit. Builds already queued or running for this election are
+    invalidated and will not put theirs in place.
+    """
+    with _lock:
+        _generation[election_id] = _generation.get(election_id, 0) + 1
+        _done.discard(election_id)
+        _pending.pop(election_id, None)
+    _move_aside(snapshot_path(election_id))
+
+def _run(app, election_id: int) -> None:
+    try:
+        with app.app_context():
+            build_snapshot(election_id)
+        with _lock:
+            _done.add(election_id)
+    except SnapshotStale as e:
+        app.logger.info("snapshot dropped: %s", e)
+    except Exception:
+        app.logger.exception("snapshot for election %s failed", election_id)
+
+def schedule_snapshot(election_id: int) -> Future | None:
+    """
+    Queue a background snapshot build for this election. Returns the build
+    already queued or running if there is one, None if the snapshot is built.
+    """
+    app = current_app._get_current_object()
+    with _lock:
+        if election_id in _done:
+            return None
+        future = _pending.get(election_id)
+        if future is None or future.done():
+            future = _pending[election_id] = _executor.submit(_run, app, election_id)
+        return future
+
+def wait_for_snapshot(election_id: int, timeout: float) -> Path | None:
+    """
+    The snapshot directory, waiting up to `timeout` seconds for this
+    process's single build of it; None if it is not ready by then. Requests
+    arriving before the sweep has noticed a finished election share that one
+    build instead of each scanning the votes.
+    """
+    if has_snapshot(election_id):
+        return snapshot_path(election_id)
+    future = schedule_snapshot(election_id)
+    if future is not None:
+        wait([future], timeout=timeout)
+    return snapshot_path(election_id) if has_snapshot(election_id) else None
+
+def sweep_due() -> None:
+    """
+    Queue snapshots for elections whose `end_at` has passed (or were closed
+    after starting) and have none yet. Throttled to once per SNAPSHOT_SWEEP_SECONDS per process.
+    """
+    global _last_sweep
+    interval = current_app.config.get("SNAPSHOT_SWEEP_SECONDS", 60)
+    mono = time.monotonic()
+    if mono - _last_sweep < interval:
+        return
+    _last_sweep = mono
+
+    from app.models import Election
+    now = datetime.now(UTC).replace(second=0, microsecond=0)
+    rows = (db.session.query(Election.id)
+            .filter(or_(Election.end_at < now, Election.closed_at.isnot(None)))
+            .filter(Election.start_at <= now)
+            .all())
+    for (eid,) in rows:
+        if eid in _done:
+            continue
+        if has_snapshot(eid):
+            with _lock:
+                _done.add(eid)
+            continue
+        schedule_snapshot(eid)
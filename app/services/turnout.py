@@ -0,0 +1,128 @@
+# app/services/turnout.py
+# Live turnout for the admin dashboard over server-sent events.
+#
+# Counts come from `chain_summaries.length`, which cast_vote already advances.
+# A vote in this worker is pushed to local viewers right away; one poller
+# thread per worker picks up votes cast in other workers with a single
+# indexed query per interval, however many viewers are connected.
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app import db
+
+class TurnoutHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: set[queue.Queue] = set()
+        self._counts: dict[int, int] = {}
+        self._since: datetime | None = None
+        self._poller: threading.Thread | None = None
+
+    # --- producers ---
+    def bump(self, election_id: int, count: int) -> None:
+        """Record a new turnout value (from cast_vote or the poller) and fan it out."""
+        with self._lock:
+            if self._counts.get(election_id, -1) >= count:
+                return
+            self._counts[election_id] = count
+            subscribers = list(self._subscribers)
+        event = {"election_id": election_id, "count": count}
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                pass  # slow viewer; it will catch up on the next change
+
+    def _poll_once(self) -> None:
+        from app.models import ChainSummary
+        stmt = select(ChainSummary.election_id, ChainSummary.length, ChainSummary.updated_at)
+        if self._since is not None:
+            # >= so a commit landing on the watermark's timestamp is not missed; bump() dedups
+            stmt = stmt.where(ChainSummary.updated_at >= self._since)
+        rows = db.session.execute(stmt).all()
+        db.session.remove()
+        for eid, length, updated_at in rows:
+            self.bump(eid, length)
+            if self._since is None or updated_at > self._since:
+                self._since = updated_at
+
+    def _run(self, app, interval: float) -> None:
+        while True:
+            with self._lock:
+                idle = not self._subscribers
+            if not idle:
+                try:
+                    with app.app_context():
+                        self._poll_once()
+                except Exception:
+                    app.logger.exception("turnout poll failed")
+            time.sleep(interval)
+
+    def start(self, app) -> None:
+        with self._lock:
+            if self._poller is not None:
+                return
+            self._poller = threading.Thread(
+                target=self._run,
+                args=(app, app.config.get("TURNOUT_POLL_SECONDS", 1.0)),
+                name="turnout-poller",
+                daemon=True,
+            )
+        self._poller.start()
+
+    # --- consumers ---
+    def snapshot(self, election_ids: list[int]) -> dict[int, int]:
+        """Current counts for `election_ids` (read from the summaries once per new viewer)."""
+        from app.models import ChainSummary
+        from app.services import chain
+        rows = db.session.execute(
+            select(ChainSummary.election_id, ChainSummary.length)
+            .where(ChainSummary.election_id.in_(election_ids))
+        ).all()
+        counts = dict(rows)
+        for eid in election_ids:
+            if eid not in counts:
+                # older election without a summary yet
+                counts[eid] = chain.summary(eid).length
+            self.bump(eid, counts[eid])
+        return counts
+
+    def stream(self, election_ids: list[int], initial: dict[int, int],
+               keepalive: float = 15.0, max_age: float = 300.0, retry: float = 3.0):
+        """
+        Generator of SSE frames for one viewer. Ends after `max_age` seconds so
+        no connection (and worker thread) is held indefinitely; the browser
+        reconnects after `retry` seconds and gets fresh counts. max_age=0
+        sends the current counts and closes at once.
+        """
+        wanted = set(election_ids)
+        q: queue.Queue = queue.Queue(maxsize=256)
+        with self._lock:
+            self._subscribers.add(q)
+            # a vote may have landed between snapshot() and this generator starting
+            latest = {eid: max(initial.get(eid, 0), self._counts.get(eid, 0)) for eid in election_ids}
+        try:
+            yield f"retry: {int(retry * 1000)}\n\n"
+            yield _frame({"counts": latest})
+            deadline = time.monotonic() + max_age
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    event = q.get(timeout=min(keepalive, remaining))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event["election_id"] in wanted:
+                    yield _frame(event)
+        finally:
+            with self._lock:
+                self._subscribers.discard(q)
+
+def _frame(payload: dict) -> str:
+    return f"data: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+hub = TurnoutHub()
@@ -0,0 +1,25 @@
+// app/static/js/login_pending.js
+// Poll the login status until the phone confirmation finishes, then complete the login.
+(() => {
+  const root = document.getElementById("login-pending");
+  if (!root) return;
+
+  const statusUrl = root.dataset.statusUrl;
+  const finishUrl = root.dataset.finishUrl;
+
+  async function poll() {
+    try {
+      const res = await fetch(statusUrl, { headers: { Accept: "application/json" }, cache: "no-store" });
+      const data = await res.json();
+      if (data.status !== "pending") {
+        window.location.assign(finishUrl);
+        return;
+      }
+    } catch (e) {
+      // network hiccup: keep polling
+    }
+    setTimeout(poll, 2000);
+  }
+
+  setTimeout(poll, 1000);
+})();
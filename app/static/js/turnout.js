@@ -0,0 +1,35 @@
+// app/static/js/turnout.js
+// Live turnout for admins: one EventSource updates every [data-turnout] badge.
+(() => {
+  const badges = document.querySelectorAll("[data-turnout]");
+  if (!badges.length || typeof EventSource === "undefined") return;
+
+  const root = document.querySelector("[data-turnout-url]");
+  if (!root) return;
+
+  const byId = new Map();
+  badges.forEach((el) => {
+    const id = el.dataset.turnout;
+    if (!byId.has(id)) byId.set(id, []);
+    byId.get(id).push(el);
+  });
+
+  const url = new URL(root.dataset.turnoutUrl, window.location.href);
+  byId.forEach((_, id) => url.searchParams.append("e", id));
+
+  function show(id, count) {
+    (byId.get(String(id)) || []).forEach((el) => {
+      el.querySelector("[data-turnout-count]").textContent = count;
+    });
+  }
+
+  const source = new EventSource(url);
+  source.onmessage = (ev) => {
+    const data = JSON.parse(ev.data);
+    if (data.counts) {
+      Object.entries(data.counts).forEach(([id, count]) => show(id, count));
+    } else {
+      show(data.election_id, data.count);
+    }
+  };
+})();
@@ -0,0 +1,77 @@
+"""
+Request overhead of cookie sessions vs. server-side (SESSION_BACKEND=db) sessions.
+
+    python benchmarks/bench_sessions.py [requests-per-case]
+
+For each session size it times a read-only request (session is loaded and
+read) and a writing request (one key changes, so the session is re-saved),
+and prints the per-request time and the Cookie header size the client sends.
+"""
+import os
+import secrets
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Extra payload on top of login keys; 3000 bytes is roughly what the old
+# per-election shuffled option lists added after a handful of elections.
+SIZES = [0, 500, 3000]
+
+def build_app(backend: str):
+    tmp = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    os.environ["SESSION_BACKEND"] = backend
+
+    from app.config import Config
+    Config.SQLALCHEMY_DATABASE_URI = os.environ["DATABASE_URL"]
+    Config.SESSION_BACKEND = backend
+    from app import create_app
+    from flask import session
+
+    app = create_app()
+
+    @app.route("/_bench/read")
+    def bench_read():
+        return session.get("kennitala", "")
+
+    @app.route("/_bench/write")
+    def bench_write():
+        session["counter"] = session.get("counter", 0) + 1
+        return "ok"
+
+    return app
+
+def run_case(app, extra_bytes: int, n: int):
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s["kennitala"] = "0101302989"
+        s["nafn"] = "Jón Jónsson"
+        s["is_admin"] = False
+        if extra_bytes:
+            s["extra"] = secrets.token_hex(extra_bytes // 2)  # incompressible
+    cookie = client.get_cookie(app.config.get("SESSION_COOKIE_NAME", "session"))
+    cookie_len = len(cookie.value) if cookie else 0
+
+    results = {}
+    for kind in ("read", "write"):
+        client.get(f"/_bench/{kind}")  # warm up
+        t0 = time.perf_counter()
+        for _ in range(n):
+            client.get(f"/_bench/{kind}")
+        results[kind] = (time.perf_counter() - t0) / n * 1e6
+    return cookie_len, results
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{'backend':8} {'extra':>6} {'cookie B':>9} {'read µs':>9} {'write µs':>9}")
+    for backend in ("cookie", "db"):
+        app = build_app(backend)
+        for size in SIZES:
+            cookie_len, r = run_case(app, size, n)
+            print(f"{backend:8} {size:>6} {cookie_len:>9} {r['read']:>9.1f} {r['write']:>9.1f}")
+
+if __name__ == "__main__":
+    main()
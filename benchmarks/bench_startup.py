@@ -0,0 +1,68 @@
+"""
+Worker cold start: import + create_app + first request, each in a fresh interpreter.
+
+    python benchmarks/bench_startup.py [--runs N] [--max-ms MS]
+
+Prints the median of each phase over N runs. With --max-ms the script exits
+non-zero if the median total exceeds MS, so it can guard against
+regressions (e.g. a heavy module-level import creeping back in).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+app = create_app()
+t2 = time.perf_counter()
+app.test_client().get("/")
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1e3,
+    "create_app_ms": (t2 - t1) * 1e3,
+    "first_request_ms": (t3 - t2) * 1e3,
+    "total_ms": (t3 - t0) * 1e3,
+    "heavy_modules": [m for m in ("markdown", "requests", "audkenni") if m in sys.modules],
+}))
+"""
+
+def run_once(env) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=7)
+    ap.add_argument("--max-ms", type=float, default=None)
+    ap.add_argument("--skip-schema-check", action="store_true", help="set SKIP_SCHEMA_CHECK=1 after the first run")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_startup_")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db")
+    run_once(env)  # creates the schema; also warms the OS file cache
+    if args.skip_schema_check:
+        env["SKIP_SCHEMA_CHECK"] = "1"
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    for key in ("import_ms", "create_app_ms", "first_request_ms", "total_ms"):
+        print(f"{key:17} {statistics.median(r[key] for r in runs):8.1f}")
+    print(f"{'heavy_modules':17} {', '.join(runs[-1]['heavy_modules']) or '-'}")
+
+    if args.max_ms is not None and statistics.median(r["total_ms"] for r in runs) > args.max_ms:
+        sys.exit(f"median start-up exceeds {args.max_ms} ms")
+
+if __name__ == "__main__":
+    main()
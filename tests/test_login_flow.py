@@ -0,0 +1,154 @@
+"""
+Background Auðkenni login (services/login_flow.py) against a stub identity
+call: pending -> finish, the concurrency cap and the circuit breaker.
+"""
+import threading
+import time
+
+import pytest
+
+from app.services import login_flow
+
+CAP = 2
+THRESHOLD = 2
+COOLDOWN = 0.2
+UNAVAILABLE = "ekki tiltæk"
+
+class Stub:
+    """Stands in for see_some_id: blocks until released, then answers or raises `error`."""
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.error = None
+
+    def __call__(self, phone, purpose):
+        self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return {"nationalRegisterId": "0101302989", "name": "Jón Jónsson"}
+
+class ProviderHTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.response = type("Response", (), {"status_code": status_code})()
+
+@pytest.fixture
+def stub(app, monkeypatch):
+    app.config.update(
+        LOGIN_MAX_CONCURRENT=CAP,
+        LOGIN_BREAKER_THRESHOLD=THRESHOLD,
+        LOGIN_BREAKER_COOLDOWN=COOLDOWN,
+    )
+    # pool, slots and breaker are per process; start each test from scratch
+    for name in ("_executor", "_slots", "_breaker"):
+        monkeypatch.setattr(login_flow, name, None)
+    stub = Stub()
+    monkeypatch.setattr(login_flow, "identify", stub)
+    yield stub
+    stub.gate.set()
+    if login_flow._executor is not None:
+        login_flow._executor.shutdown(wait=True)
+
+def wait_finished(client, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get("/login/status").get_json()["status"]
+        if status != "pending":
+            return status
+        time.sleep(0.01)
+    return "pending"
+
+def attempt(app, stub, error=None):
+    """One complete login attempt on a fresh client; returns its final status."""
+    stub.error = error
+    client = app.test_client()
+    client.post("/login", data={"phone": "5555555"})
+    return wait_finished(client)
+
+def refused(app):
+    r = app.test_client().post("/login", data={"phone": "5555555"})
+    return UNAVAILABLE in r.get_data(as_text=True)
+
+def test_pending_then_finish(app, stub):
+    stub.gate.clear()
+    client = app.test_client()
+    r = client.post("/login?next=/elections/", data={"phone": "5555555"})
+    assert r.status_code == 302 and r.location.endswith("/login/pending")
+    assert client.get("/login/status").get_json()["status"] == "pending"
+    assert client.get("/login/finish").location.endswith("/login/pending")
+
+    stub.gate.set()
+    assert wait_finished(client) == "ok"
+    r = client.get("/login/finish")
+    assert r.location.endswith("/elections/")
+    with client.session_transaction() as s:
+        assert s["kennitala"] == "0101302989"
+
+def test_cap_refuses_beyond_limit(app, stub):
+    stub.gate.clear()
+    held = [app.test_client() for _ in range(CAP)]
+    for i, c in enumerate(held):
+        c.post("/login", data={"phone": f"555000{i}"})
+    assert refused(app)
+
+    stub.gate.set()
+    assert all(wait_finished(c) == "ok" for c in held)
+    assert attempt(app, stub) == "ok"
+
+@pytest.mark.parametrize("error", [RuntimeError("USER_CANCEL"), ProviderHTTPError(404)])
+def test_user_rejections_do_not_trip_breaker(app, stub, error):
+    for _ in range(THRESHOLD + 2):
+        assert attempt(app, stub, error) == "failed"
+    assert not login_flow._breaker.is_open
+
+def test_provider_failures_trip_breaker_and_trial_recovers(app, stub):
+    attempt(app, stub, ConnectionError("connection refused"))
+    assert not login_flow._breaker.is_open
+    attempt(app, stub, ProviderHTTPError(503))
+    assert login_flow._breaker.is_open
+    assert refused(app)
+
+    time.sleep(COOLDOWN)
+    attempt(app, stub, TimeoutError("read timed out"))
+    assert login_flow._breaker.is_open  # failed trial re-opens
+
+    time.sleep(COOLDOWN)
+    assert attempt(app, stub, RuntimeError("USER_CANCEL")) == "failed"
+    assert not login_flow._breaker.is_open  # any answer from the provider closes it
+    assert attempt(app, stub) == "ok"
+
+def _trip(app, stub):
+    for _ in range(THRESHOLD):
+        attempt(app, stub, ConnectionError("connection refused"))
+    assert login_flow._breaker.is_open
+    time.sleep(COOLDOWN)
+
+def test_trial_not_consumed_when_at_capacity(app, stub):
+    _trip(app, stub)
+    stub.gate.clear()
+    stub.error = None
+    login_flow._init(app)
+    for _ in range(CAP):  # slow in-flight calls hold every slot
+        assert login_flow._slots.acquire(blocking=False)
+    assert refused(app)
+    for _ in range(CAP):
+        login_flow._slots.release()
+
+    stub.gate.set()
+    assert attempt(app, stub) == "ok"
+    assert not login_flow._breaker.is_open
+
+def test_trial_given_back_when_start_fails(app, stub, monkeypatch):
+    _trip(app, stub)
+
+    sweep = login_flow._sweep
+    def broken(app):
+        raise RuntimeError("db down")
+    monkeypatch.setattr(login_flow, "_sweep", broken)
+    with app.test_request_context():
+        with pytest.raises(RuntimeError):
+            login_flow.start("5555555", "test")
+    monkeypatch.setattr(login_flow, "_sweep", sweep)
+
+    assert attempt(app, stub) == "ok"
+    assert not login_flow._breaker.is_open